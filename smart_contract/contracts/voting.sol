@@ -76,6 +76,18 @@ contract Voting {
         emit VoterRegistered(_voterAddress);
     }
 
+    // Batch registration for bulk approvals; already registered addresses are skipped instead of reverting
+    function registerVoters(address[] memory _voterAddresses) public onlyAdmin {
+        for (uint i = 0; i < _voterAddresses.length; i++) {
+            address voterAddress = _voterAddresses[i];
+            if (voters[voterAddress].isRegistered) {
+                continue;
+            }
+            voters[voterAddress] = Voter(true, false, 0);
+            emit VoterRegistered(voterAddress);
+        }
+    }
+
     // --- Voting Process Management by Admin ---
     function setVotingPeriod(uint _startTime, uint _endTime) public onlyAdmin {
         require(currentPhase == VotingPhase.Pending, "Voting period can only be set when voting is pending.");
@@ -153,6 +165,22 @@ contract Voting {
         return (currentPhase, votingStartTime, votingEndTime, block.timestamp);
     }
 
+    // Returns every candidate in a single eth_call instead of one getCandidate(i) per candidate
+    function getAllCandidates() public view returns (string[] memory names, uint[] memory voteCounts) {
+        names = new string[](candidates.length);
+        voteCounts = new uint[](candidates.length);
+        for (uint i = 0; i < candidates.length; i++) {
+            names[i] = candidates[i].name;
+            voteCounts[i] = candidates[i].voteCount;
+        }
+        return (names, voteCounts);
+    }
+
+    // Voting status plus candidate count in a single eth_call
+    function getSnapshot() public view returns (VotingPhase phase, uint startTime, uint endTime, uint currentTime, uint candidatesCount) {
+        return (currentPhase, votingStartTime, votingEndTime, block.timestamp, candidates.length);
+    }
+
     function getVoterInfo(address _voterAddress) public view returns (bool isRegistered, bool hasVoted, uint votedFor) {
         Voter storage voter = voters[_voterAddress];
         return (voter.isRegistered, voter.hasVoted, voter.votedForCandidateId);
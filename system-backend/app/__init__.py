@@ -1,6 +1,8 @@
 # app/__init__.py
 import os
 import logging
+import time
+from datetime import datetime, UTC
 from logging.handlers import RotatingFileHandler
 
 from flask import Flask
@@ -8,15 +10,23 @@ from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from flask_sqlalchemy import SQLAlchemy
 from flask_apscheduler import APScheduler
+from apscheduler.schedulers.base import STATE_PAUSED
 
-from .utils import web3_utils
+from .utils import web3_utils, tally_cache, response_cache, event_stream, metrics, role_cache, image_store, password_hasher
 
 jwt = JWTManager()
 db = SQLAlchemy()
 scheduler = APScheduler()
 
 
-def create_app(init_scheduler=True):
+def create_app(init_scheduler=True, config_overrides=None, web3_provider=None):
+    started = time.perf_counter()
+    timings = {}
+
+    def mark(stage):
+        # 记录各启动阶段的耗时 (毫秒)，启动完成时写入日志
+        timings[stage] = (time.perf_counter() - started) * 1000 - sum(timings.values())
+
     app = Flask(__name__)
 
     # Load config
@@ -30,21 +40,21 @@ def create_app(init_scheduler=True):
         else:
             import config
             app.config.from_object(config)
+    if config_overrides:
+        app.config.update(config_overrides)
+    mark('config')
 
     db.init_app(app)
     jwt.init_app(app)
+    metrics.init_metrics(app, db)
+    response_cache.init_response_cache(app)
+    role_cache.init_role_cache(app)
+    event_stream.init_event_stream(app)
+    image_store.init_image_store(app)
+    password_hasher.init_password_hasher(app)
+    mark('extensions')
 
-    if init_scheduler:
-        if not app.debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
-            scheduler.init_app(app)
-            scheduler.start()
-            app.logger.info("APScheduler initialized and started.")
-        elif app.debug:
-            app.logger.info("APScheduler not started in debug reloader sub-process.")
-    else:
-        app.logger.info("APScheduler initialization skipped for this app instance.")
-
-    CORS(app, resources={r"/api/*": {"origins": "http://localhost:8080"}})
+    CORS(app, resources={r"/api/*": {"origins": app.config.get('CORS_ORIGIN', "http://localhost:8080")}})
 
     # --- 配置日志 ---
     log_level = logging.INFO
@@ -77,15 +87,23 @@ def create_app(init_scheduler=True):
     if is_main_process_or_not_debug:
         app.logger.info('Voting App starting up...')
 
-    # 初始化 Web3 连接 
+    # 初始化 Web3 连接 (WEB3_LAZY_INIT 时只创建对象，节点连接推迟到首次使用或后台预热)
     with app.app_context():
         try:
-            web3_utils.init_web3(app)
+            web3_utils.init_web3(app, provider=web3_provider)
+            tally_cache.init_tally_cache(app)
             # 日志放里面，确保只在成功后打印
             if is_main_process_or_not_debug:  # 只在主进程的第一次create_app时打印
                 app.logger.info("Web3 initialized successfully.")
+            if app.config.get('WEB3_LAZY_INIT', True) and app.config.get('WEB3_WARMUP_IN_BACKGROUND', True):
+                web3_utils.start_background_warmup(app)
         except Exception as e:
             app.logger.error(f"Failed to initialize Web3: {e}", exc_info=True)
+    mark('web3')
+
+    # 地址池依赖数据库模型，与蓝图一样在应用创建时导入
+    from app.utils.address_pool import init_address_pool
+    init_address_pool(app)
 
     # 注册蓝图
     from app.routes.vote_routes import vote_bp
@@ -97,5 +115,86 @@ def create_app(init_scheduler=True):
     app.register_blueprint(admin_bp)
     app.register_blueprint(user_bp)
     app.register_blueprint(auth_bp)
+    mark('blueprints')
 
+    if init_scheduler:
+        if not app.debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+            scheduler.init_app(app)
+            if app.config.get('SCHEDULER_LEADER_ELECTION', True):
+                # 多个服务进程中只有持有数据库租约的一个启动调度器，其余进程不创建调度线程
+                from app.utils.scheduler_leader import init_scheduler_leader
+                init_scheduler_leader(app, on_elected=start_scheduler, on_demoted=stop_scheduler)
+                app.logger.info("APScheduler leader election started.")
+            else:
+                start_scheduler(app)
+        elif app.debug:
+            app.logger.info("APScheduler not started in debug reloader sub-process.")
+    else:
+        app.logger.info("APScheduler initialization skipped for this app instance.")
+    mark('scheduler')
+
+    if is_main_process_or_not_debug:
+        app.logger.info(f"Startup completed in {sum(timings.values()):.1f} ms ("
+                        + ", ".join(f"{stage} {elapsed:.1f} ms" for stage, elapsed in timings.items()) + ").")
     return app
+
+
+def start_scheduler(app):
+    """启动 (或恢复) 调度器并注册定时任务；启用选举时只在成为主节点后调用"""
+    if scheduler.state == STATE_PAUSED:
+        scheduler.resume()
+    elif not scheduler.running:
+        scheduler.start()
+    app.logger.info("APScheduler initialized and started.")
+    if app.config.get('VOTE_SUBMISSION_MODE') == 'async':
+        scheduler.add_job(
+            id='poll_pending_vote_receipts',
+            func='app.utils.vote_pipeline:job_poll_pending_votes',
+            trigger='interval',
+            seconds=app.config.get('VOTE_RECEIPT_POLL_INTERVAL_SECONDS', 2),
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
+        )
+        app.logger.info("Pending vote receipt poller scheduled.")
+    if app.config.get('RECONCILER_ENABLED', True):
+        scheduler.add_job(
+            id='reconcile_chain_state',
+            func='app.utils.reconciler:job_reconcile_chain_state',
+            trigger='interval',
+            seconds=app.config.get('RECONCILER_INTERVAL_SECONDS', 300),
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
+        )
+        app.logger.info("Chain state reconciliation job scheduled.")
+    if app.config.get('RESULTS_FINALIZER_ENABLED', True):
+        scheduler.add_job(
+            id='finalize_election_results',
+            func='app.utils.results_finalizer:job_finalize_election_results',
+            trigger='interval',
+            seconds=app.config.get('RESULTS_FINALIZER_INTERVAL_SECONDS', 30),
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
+        )
+        app.logger.info("Election results finalizer scheduled.")
+    # 任务存储在内存中，按合约状态安排 (并在成为主节点后恢复) 自动开始/结束任务
+    scheduler.add_job(
+        id='sync_voting_lifecycle',
+        func='app.utils.voting_lifecycle:job_sync_lifecycle_jobs',
+        trigger='interval',
+        seconds=app.config.get('VOTING_LIFECYCLE_SYNC_SECONDS', 15),
+        next_run_time=datetime.now(UTC),
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True
+    )
+
+
+def stop_scheduler(app):
+    """失去主节点租约时暂停调度并清空任务，由新的主节点接管 (已在执行的任务会运行完毕)"""
+    if scheduler.running:
+        scheduler.pause()
+        scheduler.remove_all_jobs()
+    app.logger.info("APScheduler paused, jobs removed.")
@@ -0,0 +1,242 @@
+# app/asgi_app.py
+# 公共只读接口的 ASGI 异步服务模式:
+# /api/candidates、/api/voting_status、/api/election_deadline 由 AsyncWeb3 + 异步数据库驱动处理，
+# 等待 RPC 时不占用线程 (与 WSGI 路由共用响应缓存，/api/candidates 同样读取事件票数缓存)；
+# /api/stream 事件流直接在事件循环中等待广播事件，长连接不占用 WSGI 线程；
+# 其余所有接口仍交给原有的 Flask 应用 (通过 WSGI 适配挂载)。
+# 启动方式: uvicorn asgi:app --workers 4
+import asyncio
+import contextlib
+import hashlib
+import json
+
+from a2wsgi import WSGIMiddleware
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+from web3 import AsyncHTTPProvider, AsyncWeb3, Web3
+
+from . import create_app
+from .models.models import CandidateDetails
+from .utils.event_stream import get_event_broadcaster
+from .utils.response_cache import get_response_cache
+from .utils.tally_cache import get_tally_cache
+from .utils.web3_utils import load_contract_abi
+
+PHASE_NAMES = {0: "Pending", 1: "Active", 2: "Concluded"}
+
+# 同步驱动 -> 异步驱动
+ASYNC_DRIVERS = {'mysql+pymysql': 'mysql+aiomysql', 'sqlite': 'sqlite+aiosqlite'}
+
+
+def to_async_database_uri(uri):
+    scheme, sep, rest = uri.partition('://')
+    return ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
+
+class AsyncReadService:
+    """异步只读服务持有的 AsyncWeb3、合约与异步数据库引擎"""
+
+    def __init__(self, flask_app):
+        config = flask_app.config
+        rpc_url = config.get('GANACHE_RPC_URL')
+        if isinstance(rpc_url, (list, tuple)):
+            rpc_url = rpc_url[0]
+        self.cors_origin = config.get('CORS_ORIGIN', 'http://localhost:8080')
+        self.logger = flask_app.logger
+        self.json_provider = flask_app.json
+        self.heartbeat_interval = config.get('STREAM_HEARTBEAT_SECONDS', 15)
+        self.w3 = AsyncWeb3(AsyncHTTPProvider(rpc_url,
+                                              request_kwargs={'timeout': config.get('RPC_TIMEOUT_SECONDS', 10)}))
+        self.contract = self.w3.eth.contract(address=Web3.to_checksum_address(config.get('CONTRACT_ADDRESS')),
+                                             abi=load_contract_abi(flask_app))
+        database_uri = config.get('ASYNC_SQLALCHEMY_DATABASE_URI') or \
+            to_async_database_uri(config.get('SQLALCHEMY_DATABASE_URI'))
+        engine_options = {} if database_uri.startswith('sqlite') else \
+            {'pool_size': config.get('ASYNC_DB_POOL_SIZE', 20), 'pool_recycle': 3600}
+        self.engine = create_async_engine(database_uri, **engine_options)
+
+    async def close(self):
+        await self.engine.dispose()
+        await self.w3.provider.disconnect()
+
+    def json(self, data, status_code=200):
+        response = JSONResponse(data, status_code=status_code)
+        response.headers['Access-Control-Allow-Origin'] = self.cors_origin
+        return response
+
+    async def cached_json(self, request, namespace, build):
+        """与 ResponseCache.cached 相同：先查响应缓存，未命中时 await build() 得到 (data, status_code)，只缓存 200 响应
+
+        与 WSGI 路由共用缓存键，正文由 Flask 的 JSON provider 生成 (与 jsonify 逐字节相同)，
+        因此无论哪种服务模式写入的条目，正文与 ETag 都一致。响应缓存的读写是同步调用 (区块号查询、Redis)，
+        放到线程池中执行。
+        """
+        cache = get_response_cache()
+        if not cache.enabled or cache.backend is None:
+            data, status_code = await build()
+            return self.json(data, status_code)
+        try:
+            key, block_number, entry = await run_in_threadpool(cache.lookup, namespace, request.url.query)
+        except Exception as e:
+            self.logger.warning(f"Response cache unavailable for '{namespace}': {e}")
+            data, status_code = await build()
+            return self.json(data, status_code)
+
+        if entry is None:
+            data, status_code = await build()
+            if status_code != 200:
+                return self.json(data, status_code)
+            body = self.json_provider.response(data).get_data()
+            try:
+                entry = await run_in_threadpool(cache.store, key, body, 'application/json', block_number)
+            except Exception as e:
+                self.logger.warning(f"Failed to store response cache '{namespace}': {e}")
+                return self.json(data)
+        return self.cached_response(request, entry, cache.default_ttl)
+
+    def cached_response(self, request, entry, ttl):
+        """按缓存条目返回响应，与 ResponseCache.cached 设置相同的 ETag/Cache-Control/X-Block-Number 头"""
+        etag = entry.get('etag') or hashlib.sha1(entry['body']).hexdigest()
+        headers = {
+            'ETag': f'"{etag}"',
+            'Cache-Control': f"public, max-age={int(ttl)}",
+            'X-Block-Number': str(entry['block_number']),
+            'Access-Control-Allow-Origin': self.cors_origin,
+        }
+        if_none_match = request.headers.get('if-none-match', '')
+        if etag in [tag.strip().removeprefix('W/').strip('"') for tag in if_none_match.split(',')]:
+            return Response(status_code=304, headers=headers)
+        return Response(entry['body'], status_code=entry['status'], media_type=entry['mimetype'], headers=headers)
+
+    async def candidates(self, request):
+        """与 WSGI 的 /api/candidates 相同：响应缓存未命中时由事件票数缓存生成"""
+        return await self.cached_json(request, 'candidates', self._candidates_data)
+
+    async def _candidates_data(self):
+        try:
+            try:
+                # 票数缓存的增量拉取是同步调用，放到线程池中执行
+                candidates_on_chain, block_number = await run_in_threadpool(get_tally_cache().snapshot)
+            except Exception as cache_err:
+                # 事件缓存不可用时退回到并发读取合约状态
+                self.logger.warning(f"Tally cache unavailable, falling back to contract reads: {cache_err}")
+                candidate_count, block_number = await asyncio.gather(
+                    self.contract.functions.getCandidatesCount().call(), self.w3.eth.block_number)
+                candidates_on_chain = await asyncio.gather(
+                    *[self.contract.functions.getCandidate(i).call() for i in range(candidate_count)])
+
+            names_on_chain = [name for name, _ in candidates_on_chain]
+            details_by_name = {}
+            if names_on_chain:
+                async with self.engine.connect() as connection:
+                    result = await connection.execute(
+                        select(CandidateDetails.__table__).where(CandidateDetails.name.in_(names_on_chain)))
+                    details_by_name = {row.name: row for row in result}
+
+            candidates_list = []
+            for i, (name_on_chain, vote_count_on_chain) in enumerate(candidates_on_chain):
+                detail = details_by_name.get(name_on_chain)
+                candidates_list.append({
+                    "id_on_chain": i,
+                    "name": name_on_chain,
+                    "vote_count_from_chain": vote_count_on_chain,
+                    "description": detail.description if detail else None,
+                    "image_url": detail.image_url if detail else None,
+                    "slogan": detail.slogan if detail else None,
+                    "id": detail.id if detail else None,
+                    "created_at": detail.created_at.isoformat() if detail and detail.created_at else None,
+                    "updated_at": detail.updated_at.isoformat() if detail and detail.updated_at else None,
+                })
+            return {"success": True, "candidates": candidates_list, "block_number": block_number}, 200
+        except Exception as e:
+            return {"success": False, "message": f"An error occurred while fetching candidates: {str(e)}"}, 500
+
+    async def voting_status(self, request):
+        return await self.cached_json(request, 'voting_status', self._voting_status_data)
+
+    async def _voting_status_data(self):
+        try:
+            phase_code, start_time_ts, end_time_ts, _ = await self.contract.functions.getVotingStatus().call()
+            return {
+                "success": True,
+                "phase": PHASE_NAMES.get(phase_code, "Unknown"),
+                "phase_code": phase_code,
+                "isStarted": phase_code in (1, 2),
+                "isEnded": phase_code == 2,
+                "startTime": start_time_ts,
+                "endTime": end_time_ts,
+            }, 200
+        except Exception as e:
+            return {
+                "success": False,
+                "message": f"Error retrieving voting status: {str(e)}",
+                "phase": "Error",
+                "phase_code": -1,
+                "isStarted": False,
+                "isEnded": True,
+                "startTime": 0,
+                "endTime": 0
+            }, 500
+
+    async def election_deadline(self, request):
+        return await self.cached_json(request, 'election_deadline', self._election_deadline_data)
+
+    async def _election_deadline_data(self):
+        try:
+            deadline_timestamp = await self.contract.functions.votingDeadline().call()
+            return {"success": True, "votingDeadlineTimestamp": deadline_timestamp}, 200
+        except Exception as e:
+            return {"success": False, "message": str(e)}, 500
+
+    async def stream_events(self, request):
+        """与 Flask 的 /api/stream 相同的 Server-Sent Events，订阅同一个 EventBroadcaster
+
+        客户端断开时 Starlette 取消生成器，finally 中取消订阅。
+        """
+        broadcaster = get_event_broadcaster()
+        subscriber = broadcaster.subscribe_async()
+
+        async def generate():
+            try:
+                yield "retry: 3000\n\n"
+                while True:
+                    try:
+                        event = await asyncio.wait_for(subscriber.get(), timeout=self.heartbeat_interval)
+                    except asyncio.TimeoutError:
+                        yield ": keep-alive\n\n"
+                        continue
+                    yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+            finally:
+                broadcaster.unsubscribe(subscriber)
+
+        return StreamingResponse(generate(), media_type='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no',  # 避免 nginx 缓冲事件流
+            'Access-Control-Allow-Origin': self.cors_origin,
+        })
+
+
+def create_asgi_app(flask_app=None):
+    """异步只读路由与原有 Flask 应用并存的 ASGI 应用"""
+    flask_app = flask_app or create_app()
+    service = AsyncReadService(flask_app)
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        yield
+        await service.close()
+
+    return Starlette(
+        routes=[
+            Route('/api/candidates', service.candidates, methods=['GET']),
+            Route('/api/voting_status', service.voting_status, methods=['GET']),
+            Route('/api/election_deadline', service.election_deadline, methods=['GET']),
+            Route('/api/stream', service.stream_events, methods=['GET']),
+            Mount('/', app=WSGIMiddleware(flask_app, workers=flask_app.config.get('ASGI_WSGI_THREADS', 10))),
+        ],
+        lifespan=lifespan
+    )
@@ -2,6 +2,7 @@
 
 from datetime import datetime, UTC
 
+from flask import current_app, has_app_context
 from sqlalchemy.sql import func
 from werkzeug.security import generate_password_hash, check_password_hash
 
@@ -19,9 +20,10 @@ class User(db.Model):
     created_at = db.Column(db.DateTime, default=func.current_timestamp())
     updated_at = db.Column(db.DateTime, default=func.current_timestamp(), onupdate=func.current_timestamp())
 
-    # 密码处理
+    # 密码处理 (请求处理中请使用 password_hasher 在进程池中计算)
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        method = current_app.config.get('PASSWORD_HASH_METHOD', 'scrypt') if has_app_context() else 'scrypt'
+        self.password_hash = generate_password_hash(password, method=method)
 
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
@@ -29,7 +31,9 @@ class User(db.Model):
     def __repr__(self):
         return f'<User {self.userid} ({self.role})>'
 
-    def to_dict(self, include_eth_address=True, include_voter_status=True, include_has_voted_status=True):  # 添加新参数
+    def to_dict(self, include_eth_address=True, include_voter_status=True, include_has_voted_status=True,
+                voter_status=None):
+        """voter_status 为 load_voter_status() 预先查询的结果；未提供时补一次查询"""
         data = {
             'id': self.id,
             'userid': self.userid,
@@ -41,41 +45,23 @@ class User(db.Model):
             data['ethereum_address'] = self.ethereum_address
 
         if include_voter_status:
+            if voter_status is None:
+                voter_status = load_voter_status([self.id]).get(self.id, EMPTY_VOTER_STATUS)
+
             data['is_voter'] = False  # 默认值
             data['voter_is_registered_on_chain'] = False  # 默认值
-            has_voted_in_db = False  # 用户投票状态的默认值 (基于数据库)
-
             if self.voter_record:  # self.voter_record 是 Voter 与 User 的反向引用
                 data['is_voter'] = True
                 data['voter_is_registered_on_chain'] = self.voter_record.is_registered_on_chain
 
-                # 检查数据库中该选民是否有投票记录
-                if include_has_voted_status:  # 仅当请求时才检查
-                    vote_cast_by_user = Votes.query.filter_by(voter_id=self.voter_record.id).first()
-                    if vote_cast_by_user:
-                        has_voted_in_db = True
-
             if include_has_voted_status:
                 # 添加用户是否已投票的状态 (基于数据库)
-                data['has_voted'] = has_voted_in_db
-
-            # voter_application_status 的逻辑保持不变
-            latest_pending_or_approved_app = VoterApplication.query.filter_by(user_id=self.id) \
-                .filter(VoterApplication.status.in_(['pending', 'approved'])) \
-                .order_by(VoterApplication.submitted_at.desc()).first()
-
-            if latest_pending_or_approved_app:
-                data['voter_application_status'] = latest_pending_or_approved_app.status
-                data['voter_application_id'] = latest_pending_or_approved_app.id
-            else:
-                latest_rejected_app = VoterApplication.query.filter_by(user_id=self.id) \
-                    .filter_by(status='rejected') \
-                    .order_by(VoterApplication.submitted_at.desc()).first()
-                if latest_rejected_app:
-                    data['voter_application_status'] = 'rejected'  # type:ignore
-                    data['voter_application_id'] = latest_rejected_app.id
-                else:
-                    data['voter_application_status'] = None
+                data['has_voted'] = bool(self.voter_record) and voter_status['has_voted']
+
+            # 优先取最新的 pending/approved 申请，否则取最新的 rejected 申请
+            data['voter_application_status'] = voter_status['application_status']
+            if voter_status['application_id'] is not None:
+                data['voter_application_id'] = voter_status['application_id']
 
         return data
 
@@ -110,6 +96,11 @@ class CandidateDetails(db.Model):
 
 class VoterApplication(db.Model):
     __tablename__ = 'voter_applications'
+    __table_args__ = (
+        db.Index('idx_voter_applications_status_submitted', 'status', 'submitted_at', 'id'),
+        db.Index('idx_voter_applications_submitted', 'submitted_at', 'id'),
+        db.Index('idx_voter_applications_user_status', 'user_id', 'status', 'submitted_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -204,3 +195,261 @@ class Votes(db.Model):
             "voted_at_on_chain": self.voted_at_on_chain.isoformat() if self.voted_at_on_chain else None,
             "created_at": self.created_at.isoformat() if self.created_at else None
         }
+
+
+class PendingVote(db.Model):
+    __tablename__ = 'pending_votes'
+    __table_args__ = (db.Index('idx_pending_votes_status', 'status'),)
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    ticket_id = db.Column(db.String(36), unique=True, nullable=False)  # 返回给前端用于轮询的票据 ID
+    voter_id = db.Column(db.Integer, db.ForeignKey('voters.id'), nullable=False)
+    candidate_index_on_chain = db.Column(db.Integer, nullable=False)
+    transaction_hash = db.Column(db.String(66), unique=True, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # 'pending', 'confirmed', 'failed'
+    error_message = db.Column(db.String(255), nullable=True)
+    vote_id = db.Column(db.Integer, db.ForeignKey('votes.id', ondelete='SET NULL'), nullable=True)  # 确认后写入的投票记录
+    # 由应用以 UTC 写入 (不依赖数据库会话时区)，回执轮询据此判断超时
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(UTC))
+    updated_at = db.Column(db.DateTime, default=func.current_timestamp(), onupdate=func.current_timestamp())
+
+    def __repr__(self):
+        return f'<PendingVote {self.ticket_id} ({self.status}) TX {self.transaction_hash}>'
+
+    def to_dict(self):
+        return {
+            'ticket_id': self.ticket_id,
+            'voter_id': self.voter_id,
+            'candidate_index_on_chain': self.candidate_index_on_chain,
+            'transaction_hash': self.transaction_hash,
+            'status': self.status,
+            'error_message': self.error_message,
+            'vote_id': self.vote_id,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+EMPTY_VOTER_STATUS = {'has_voted': False, 'application_status': None, 'application_id': None}
+
+
+def _voter_status_columns():
+    """构造选民状态相关的列: 是否已投票 (EXISTS) 与最新申请 (窗口函数取每个用户排名第一的申请)"""
+    has_voted = db.session.query(Votes.id) \
+        .join(Voter, Votes.voter_id == Voter.id) \
+        .filter(Voter.user_id == User.id) \
+        .exists().label('has_voted')
+
+    ranked_applications = db.session.query(
+        VoterApplication.user_id.label('user_id'),
+        VoterApplication.id.label('application_id'),
+        VoterApplication.status.label('application_status'),
+        func.row_number().over(
+            partition_by=VoterApplication.user_id,
+            order_by=(
+                db.case((VoterApplication.status.in_(['pending', 'approved']), 0), else_=1),
+                VoterApplication.submitted_at.desc(),
+                VoterApplication.id.desc()
+            )
+        ).label('rn')
+    ).filter(VoterApplication.status.in_(['pending', 'approved', 'rejected'])).subquery()
+
+    return has_voted, ranked_applications
+
+
+def _row_to_voter_status(has_voted, application_status, application_id):
+    return {
+        'has_voted': bool(has_voted),
+        'application_status': application_status,
+        'application_id': application_id
+    }
+
+
+def query_users_with_voter_status(*criterion):
+    """一次 SQL 往返查询用户及其选民记录、是否已投票、最新申请状态，返回 [(user, voter_status), ...]"""
+    has_voted, ranked_applications = _voter_status_columns()
+    rows = db.session.query(User, has_voted, ranked_applications.c.application_status,
+                            ranked_applications.c.application_id) \
+        .outerjoin(ranked_applications, db.and_(ranked_applications.c.user_id == User.id,
+                                                ranked_applications.c.rn == 1)) \
+        .filter(*criterion) \
+        .all()
+    return [(user, _row_to_voter_status(voted, status, app_id)) for user, voted, status, app_id in rows]
+
+
+def load_voter_status(user_ids):
+    """批量查询一组用户的选民状态 {user_id: voter_status}，只需一次 SQL 往返"""
+    if not user_ids:
+        return {}
+    has_voted, ranked_applications = _voter_status_columns()
+    rows = db.session.query(User.id, has_voted, ranked_applications.c.application_status,
+                            ranked_applications.c.application_id) \
+        .outerjoin(ranked_applications, db.and_(ranked_applications.c.user_id == User.id,
+                                                ranked_applications.c.rn == 1)) \
+        .filter(User.id.in_(user_ids)) \
+        .all()
+    return {user_id: _row_to_voter_status(voted, status, app_id) for user_id, voted, status, app_id in rows}
+
+
+def users_to_dicts(users, **kwargs):
+    """序列化一组用户，选民状态统一用一次查询加载，避免逐个用户的 N+1 查询"""
+    if kwargs.get('include_voter_status', True):
+        statuses = load_voter_status([user.id for user in users])
+        return [user.to_dict(voter_status=statuses.get(user.id, EMPTY_VOTER_STATUS), **kwargs) for user in users]
+    return [user.to_dict(**kwargs) for user in users]
+
+
+class IndexerCursor(db.Model):
+    __tablename__ = 'indexer_cursors'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    name = db.Column(db.String(100), nullable=False, unique=True)  # 索引器名称，支持多个独立的索引进程
+    last_block = db.Column(db.BigInteger, nullable=False, default=-1)  # 已完整处理到的区块高度
+    updated_at = db.Column(db.DateTime, default=func.current_timestamp(), onupdate=func.current_timestamp())
+
+    def __repr__(self):
+        return f'<IndexerCursor {self.name} @ {self.last_block}>'
+
+
+class ReconciliationReport(db.Model):
+    """每个对账任务最近一次运行的报告 (JSON)，任意服务进程的管理员接口都能读取"""
+    __tablename__ = 'reconciliation_reports'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    name = db.Column(db.String(100), nullable=False, unique=True)
+    report = db.Column(db.Text, nullable=False)
+    updated_at = db.Column(db.DateTime, default=func.current_timestamp(), onupdate=func.current_timestamp())
+
+    def __repr__(self):
+        return f'<ReconciliationReport {self.name} @ {self.updated_at}>'
+
+
+class AccountNonce(db.Model):
+    """发送账户的下一个 nonce，多个服务进程发送交易时通过该行的行锁串行分配"""
+    __tablename__ = 'account_nonces'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    address = db.Column(db.String(42), nullable=False, unique=True)
+    next_nonce = db.Column(db.BigInteger, nullable=True)  # 为空表示下次发送前按链上 pending 计数同步
+    updated_at = db.Column(db.DateTime, default=func.current_timestamp(), onupdate=func.current_timestamp())
+
+    def __repr__(self):
+        return f'<AccountNonce {self.address} -> {self.next_nonce}>'
+
+
+class SchedulerLease(db.Model):
+    """调度器主节点租约：持有未过期租约的进程运行定时任务，其它进程定期尝试接管"""
+    __tablename__ = 'scheduler_leases'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    name = db.Column(db.String(100), nullable=False, unique=True)
+    holder = db.Column(db.String(255), nullable=False)  # 主机名:进程号:随机后缀
+    expires_at = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime, default=func.current_timestamp(), onupdate=func.current_timestamp())
+
+    def __repr__(self):
+        return f'<SchedulerLease {self.name} held by {self.holder} until {self.expires_at}>'
+
+
+class EthAddressPool(db.Model):
+    """可分配给注册用户的以太坊地址 (由 Ganache 账户列表初始化)，user_id 为空表示尚未被占用"""
+    __tablename__ = 'eth_address_pool'
+    __table_args__ = (db.Index('idx_eth_address_pool_user', 'user_id', 'id'),)
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    address = db.Column(db.String(42), unique=True, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='SET NULL'), nullable=True)
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, default=func.current_timestamp())
+
+    def __repr__(self):
+        return f'<EthAddressPool {self.address} -> {self.user_id}>'
+
+
+class VotingPeriod(db.Model):
+    __tablename__ = 'voting_periods'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    start_time = db.Column(db.BigInteger, nullable=False)  # 合约中的开始时间戳 (秒)
+    end_time = db.Column(db.BigInteger, nullable=False)  # 合约中的结束时间戳 (秒)
+    transaction_hash = db.Column(db.String(66), unique=True, nullable=False)
+    block_number = db.Column(db.BigInteger, nullable=False)
+    created_at = db.Column(db.DateTime, default=func.current_timestamp())
+
+    def __repr__(self):
+        return f'<VotingPeriod {self.start_time} - {self.end_time} @ block {self.block_number}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'start_time': self.start_time,
+            'end_time': self.end_time,
+            'transaction_hash': self.transaction_hash,
+            'block_number': self.block_number,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class ElectionResult(db.Model):
+    """VotingEnded 之后生成的不可变结果快照，由 results_finalizer 写入并与链上状态核对"""
+    __tablename__ = 'election_results'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    end_transaction_hash = db.Column(db.String(66), unique=True, nullable=False)  # endVoting 交易哈希
+    block_number = db.Column(db.BigInteger, nullable=False)  # VotingEnded 事件所在区块
+    start_time = db.Column(db.BigInteger, nullable=False)  # 合约中的实际开始时间戳 (秒)
+    end_time = db.Column(db.BigInteger, nullable=False)  # VotingEnded 事件中的结束时间戳 (秒)
+    total_votes = db.Column(db.Integer, nullable=False)
+    registered_voters = db.Column(db.Integer, nullable=False)  # 截至结束区块在链上注册的选民数
+    snapshot_hash = db.Column(db.String(64), nullable=False)  # 结果内容的 SHA-256，用作 ETag
+    finalized_at = db.Column(db.DateTime, default=func.current_timestamp())
+
+    candidates = db.relationship('ElectionResultCandidate', backref='result', lazy='selectin',
+                                 order_by='ElectionResultCandidate.candidate_index')
+
+    def __repr__(self):
+        return f'<ElectionResult @ block {self.block_number}: {self.total_votes} votes>'
+
+    @property
+    def turnout(self):
+        return round(self.total_votes / self.registered_voters, 4) if self.registered_voters else 0.0
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'end_transaction_hash': self.end_transaction_hash,
+            'block_number': self.block_number,
+            'start_time': self.start_time,
+            'end_time': self.end_time,
+            'total_votes': self.total_votes,
+            'registered_voters': self.registered_voters,
+            'turnout': self.turnout,
+            'snapshot_hash': self.snapshot_hash,
+            'candidates': [candidate.to_dict() for candidate in self.candidates],
+            'finalized_at': self.finalized_at.isoformat() if self.finalized_at else None
+        }
+
+
+class ElectionResultCandidate(db.Model):
+    __tablename__ = 'election_result_candidates'
+    __table_args__ = (db.UniqueConstraint('result_id', 'candidate_index', name='uq_result_candidate'),)
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    result_id = db.Column(db.Integer, db.ForeignKey('election_results.id', ondelete='CASCADE'), nullable=False)
+    candidate_index = db.Column(db.Integer, nullable=False)  # 链上候选人索引
+    candidate_id = db.Column(db.Integer, db.ForeignKey('candidate_details.id', ondelete='SET NULL'), nullable=True)
+    name = db.Column(db.String(255), nullable=False)
+    vote_count = db.Column(db.Integer, nullable=False)  # 链上票数
+    db_vote_count = db.Column(db.Integer, nullable=False, default=0)  # 定稿时 votes 表中的票数，仅用于审计
+
+    def __repr__(self):
+        return f'<ElectionResultCandidate #{self.candidate_index} {self.name}: {self.vote_count}>'
+
+    def to_dict(self):
+        return {
+            'id_on_chain': self.candidate_index,
+            'id': self.candidate_id,
+            'name': self.name,
+            'vote_count': self.vote_count,
+            'db_vote_count': self.db_vote_count
+        }
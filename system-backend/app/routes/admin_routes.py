@@ -1,18 +1,26 @@
 # app/routes/admin_routes.py
 import json
-import os
 from datetime import datetime, UTC
 from functools import wraps
 
-from flask import Blueprint, request, jsonify, current_app, send_from_directory
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from web3.exceptions import ContractLogicError
-from werkzeug.utils import secure_filename
 
 from .. import db
 from ..models.models import CandidateDetails, Voter, User, VoterApplication
-from ..utils.web3_utils import get_contract, get_w3
-from app import scheduler, create_app
+from ..utils.web3_utils import get_contract, get_w3, get_contract_snapshot, get_rpc_endpoint_stats
+from ..utils.response_cache import response_cache
+from ..utils.pagination import keyset_paginate
+from ..utils.nonce_manager import get_nonce_manager
+from ..utils.gas_policy import get_gas_policy
+from ..utils.role_cache import AdminIdentity, role_cache
+from ..utils.export import EXPORT_FORMATS, EXPORT_QUERIES, stream_export
+from ..utils.reconciler import get_last_report, reconcile_chain_state
+from ..utils.results_finalizer import finalize_election_results
+from ..utils.image_store import get_image_store
+from ..utils.voting_lifecycle import AUTO_END_JOB_ID, AUTO_START_JOB_ID, cancel_job, schedule_auto_end, \
+    schedule_auto_start
 
 admin_bp = Blueprint('admin_routes', __name__, url_prefix='/api/admin')
 
@@ -32,17 +40,21 @@ def admin_required(fn):
                 f"Role: {user_role}) attempted admin action on {request.path}")
             return jsonify(success=False, message="Administration rights required."), 403
 
-        # 从数据库再次确认角色
-        admin_user_db = User.query.get(user_id_from_token)
-        if not admin_user_db or admin_user_db.role != 'admin':
-            current_app.logger.error(
-                f"Admin role mismatch for user ID {user_id_from_token} (Token role: {user_role}, "
-                f"DB role: {admin_user_db.role if admin_user_db else 'Not Found'}). "
-                f"Potential security issue or outdated token.")
-            return jsonify(success=False, message="Admin status verification failed."), 403
-
-        # 将确认后的管理员用户对象传递给需要的路由函数
-        kwargs['current_admin_user'] = admin_user_db
+        # 从数据库再次确认角色 (结果短时缓存，管理后台轮询时不必每次查询)
+        admin_identity = role_cache.get(user_id_from_token)
+        if admin_identity is None:
+            admin_user_db = User.query.get(user_id_from_token)
+            if not admin_user_db or admin_user_db.role != 'admin':
+                current_app.logger.error(
+                    f"Admin role mismatch for user ID {user_id_from_token} (Token role: {user_role}, "
+                    f"DB role: {admin_user_db.role if admin_user_db else 'Not Found'}). "
+                    f"Potential security issue or outdated token.")
+                return jsonify(success=False, message="Admin status verification failed."), 403
+            admin_identity = AdminIdentity(admin_user_db.id, admin_user_db.userid, admin_user_db.role)
+            role_cache.set(user_id_from_token, admin_identity)
+
+        # 将确认后的管理员身份 (id, userid, role) 传递给需要的路由函数
+        kwargs['current_admin_user'] = admin_identity
         return fn(*args, **kwargs)
 
     return wrapper
@@ -105,7 +117,8 @@ def add_new_candidate(current_admin_user):
         tx_sender_account = w3.eth.default_account
         current_app.logger.info(
             f"Attempting to add candidate '{candidate_name}' to blockchain from admin account: {tx_sender_account}")
-        tx_hash = contract.functions.addCandidate(candidate_name).transact({'from': tx_sender_account})
+        tx_hash = get_nonce_manager().transact(contract.functions.addCandidate(candidate_name),
+                                               {'from': tx_sender_account})
         tx_receipt = w3.eth.wait_for_transaction_receipt(tx_hash, timeout=120)
 
         # 检查交易是否成功
@@ -122,6 +135,7 @@ def add_new_candidate(current_admin_user):
                                             slogan=slogan)
         db.session.add(new_candidate_db)
         db.session.commit()
+        response_cache.invalidate('candidates')
         current_app.logger.info(
             f"Candidate '{candidate_name}' (ID: {new_candidate_db.id}) added by admin '{current_admin_user.userid}'. "
             f"TX: {tx_hash.hex()}")
@@ -143,7 +157,7 @@ def add_new_candidate(current_admin_user):
 @admin_bp.route('/upload_candidate_image', methods=['POST'])
 @admin_required
 def upload_candidate_image(current_admin_user):
-    """上传候选人图片"""
+    """上传候选人图片 (按内容哈希保存，并生成缩略图与展示尺寸)"""
     try:
         if 'file' not in request.files:
             return jsonify({"success": False, "message": "未找到文件"}), 400
@@ -152,42 +166,28 @@ def upload_candidate_image(current_admin_user):
         if file.filename == '':
             return jsonify({"success": False, "message": "未选择文件"}), 400
 
-        # 安全处理文件名
-        filename = secure_filename(file.filename)
-
-        # 使用时间戳确保文件名唯一
-        timestamp = int(datetime.now(UTC).timestamp())
-        name_parts = os.path.splitext(filename)
-        unique_filename = f"{name_parts[0]}_{timestamp}{name_parts[1]}"
-
-        # 确保上传目录存在
-        def ensure_upload_dir(directory):
-            """确保指定的上传目录存在"""
-            if not os.path.exists(directory):
-                os.makedirs(directory)
-            return directory
-
-        # 获取上传目录路径，确保它存在
-        uploads_directory = os.path.join(current_app.root_path, 'uploads')
-        candidates_upload_dir = os.path.join(uploads_directory, 'candidates')
-        ensure_upload_dir(candidates_upload_dir)
-
-        # 保存文件
-        file_path = os.path.join(candidates_upload_dir, unique_filename)
-        file.save(file_path)
+        try:
+            digest, filenames, deduplicated = get_image_store().save(file)
+        except ValueError as e:
+            return jsonify({"success": False, "message": f"上传失败: {str(e)}"}), 400
 
-        # 确定公开访问的URL
+        # 确定公开访问的URL: image_url 指向展示尺寸，其余尺寸一并返回
         base_url = current_app.config.get('BASE_URL')
-        image_url = f"{base_url}/api/admin/uploads/candidates/{unique_filename}"
+        image_urls = {name: f"{base_url}/api/admin/uploads/candidates/{filename}"
+                      for name, filename in filenames.items()}
 
         current_app.logger.info(
-            f"Admin '{current_admin_user.userid}' uploaded candidate image. File saved as: {file_path}")
+            f"Admin '{current_admin_user.userid}' uploaded candidate image {digest} "
+            f"({'deduplicated' if deduplicated else 'stored'}).")
 
         return jsonify({
             "success": True,
             "message": "图片上传成功",
-            "image_url": image_url,
-            "filename": unique_filename
+            "image_url": image_urls.get('display', image_urls['original']),
+            "image_urls": image_urls,
+            "filename": filenames.get('display', filenames['original']),
+            "content_hash": digest,
+            "deduplicated": deduplicated
         }), 200
 
     except Exception as e:
@@ -199,11 +199,8 @@ def upload_candidate_image(current_admin_user):
 # 添加一个路由来提供上传的文件访问
 @admin_bp.route('/uploads/candidates/<filename>', methods=['GET'])
 def get_candidate_image(filename):
-    """获取上传的候选人图片"""
-    # 直接指向实际存储路径
-    uploads_directory = os.path.join(current_app.root_path, 'uploads')
-    candidates_upload_dir = os.path.join(uploads_directory, 'candidates')
-    return send_from_directory(candidates_upload_dir, filename)
+    """获取上传的候选人图片 (内容寻址的文件可被浏览器/CDN 永久缓存)"""
+    return get_image_store().send(filename)
 
 
 @admin_bp.route('/voter_applications', methods=['GET'])
@@ -214,16 +211,36 @@ def get_voter_applications(current_admin_user):
     current_app.logger.info(f"Admin '{current_admin_user.userid}' fetching voter applications.")
     try:
         status_filter = request.args.get('status', 'pending')
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
-
-        query = VoterApplication.query
+        per_page = min(request.args.get('per_page', 10, type=int), 100)
+        cursor = request.args.get('cursor')
+
+        # 申请人和审核管理员在同一条 SQL 中 JOIN 加载，避免 to_dict() 触发懒加载
+        query = VoterApplication.query.options(
+            db.joinedload(VoterApplication.user),
+            db.joinedload(VoterApplication.reviewed_by_admin)
+        )
         if status_filter and status_filter != 'all':
             query = query.filter(VoterApplication.status == status_filter)
 
-        applications_pagination = query.order_by(VoterApplication.submitted_at.desc()).paginate(page=page,
-                                                                                                per_page=per_page,
-                                                                                                error_out=False)
+        # 提供 cursor (首页传空字符串) 时使用 (submitted_at, id) 游标分页，深页也能走索引
+        if cursor is not None:
+            try:
+                applications, next_cursor = keyset_paginate(
+                    query, [VoterApplication.submitted_at, VoterApplication.id], cursor=cursor, limit=per_page)
+            except ValueError as cursor_err:
+                return jsonify({"success": False, "message": str(cursor_err)}), 400
+            return jsonify({
+                "success": True,
+                "applications": [application.to_dict() for application in applications],
+                "next_cursor": next_cursor,
+                "has_more": next_cursor is not None
+            }), 200
+
+        page = request.args.get('page', 1, type=int)
+        applications_pagination = query.order_by(VoterApplication.submitted_at.desc(),
+                                                 VoterApplication.id.desc()).paginate(page=page,
+                                                                                      per_page=per_page,
+                                                                                      error_out=False)
         applications_list = [app.to_dict() for app in applications_pagination.items]
 
         return jsonify({
@@ -277,6 +294,11 @@ def review_voter_application(current_admin_user, application_id):
             return jsonify({"success": False,
                             "message": "Applicant does not have an Ethereum address. Cannot approve application."}), 400
 
+        # 先完成查询再修改 application：查询触发的 autoflush 会让请求会话提前开始写事务，
+        # 在 SQLite 上它持有的写锁会挡住发送交易时 nonce 协调器对 account_nonces 的更新
+        existing_voter = Voter.query.filter_by(user_id=applicant_user.id).first() \
+            if new_status == 'approved' else None
+
         # 更新 application 的状态
         application.status = new_status
         # 使用当前管理员的 ID
@@ -285,7 +307,6 @@ def review_voter_application(current_admin_user, application_id):
 
         # 如果 new_status == 'approved'
         if new_status == 'approved':
-            existing_voter = Voter.query.filter_by(user_id=applicant_user.id).first()
             if existing_voter:
                 current_app.logger.warning(
                     f"User ID {applicant_user.id} is already a voter (ID: {existing_voter.id}) "
@@ -314,8 +335,8 @@ def review_voter_application(current_admin_user, application_id):
                 f"(User ID: {applicant_user.id}) on blockchain by system admin account {admin_tx_account}.")
 
             try:
-                tx_hash = contract.functions.registerVoter(applicant_user.ethereum_address).transact(
-                    {'from': admin_tx_account})
+                tx_hash = get_nonce_manager().transact(
+                    contract.functions.registerVoter(applicant_user.ethereum_address), {'from': admin_tx_account})
                 tx_receipt = w3.eth.wait_for_transaction_receipt(tx_hash, timeout=120)
 
                 if tx_receipt.status == 1:
@@ -391,6 +412,135 @@ def review_voter_application(current_admin_user, application_id):
         return jsonify({"success": False, "message": f"An error occurred: {str(e)}"}), 500
 
 
+@admin_bp.route('/voter_applications/bulk_approve', methods=['POST'])
+@admin_required
+def bulk_approve_voter_applications(current_admin_user):
+    """管理员批量批准选民申请，按批次调用合约 registerVoters 上链注册"""
+    try:
+        data = request.get_json()
+        application_ids = data.get('application_ids') if data else None
+        if not isinstance(application_ids, list) or not application_ids:
+            return jsonify({"success": False, "message": "application_ids must be a non-empty list."}), 400
+        if not all(isinstance(application_id, int) for application_id in application_ids):
+            return jsonify({"success": False, "message": "application_ids must contain integers only."}), 400
+        application_ids = list(dict.fromkeys(application_ids))  # 去重并保持顺序
+
+        max_batch = current_app.config.get('BULK_APPROVE_MAX_APPLICATIONS', 5000)
+        if len(application_ids) > max_batch:
+            return jsonify({"success": False,
+                            "message": f"At most {max_batch} applications can be approved in one request."}), 400
+
+        current_app.logger.info(
+            f"Admin '{current_admin_user.userid}' bulk approving {len(application_ids)} voter applications.")
+
+        # 1. 一次查询取出所有申请及申请人，逐条校验
+        applications = VoterApplication.query.options(db.joinedload(VoterApplication.user)) \
+            .filter(VoterApplication.id.in_(application_ids)).all()
+        applications_by_id = {application.id: application for application in applications}
+        applicant_user_ids = [application.user_id for application in applications]
+        existing_voter_user_ids = {
+            row[0] for row in db.session.query(Voter.user_id).filter(Voter.user_id.in_(applicant_user_ids)).all()
+        } if applicant_user_ids else set()
+
+        results = {}
+        to_register = []  # 需要上链注册的申请
+        for application_id in application_ids:
+            application = applications_by_id.get(application_id)
+            if not application:
+                results[application_id] = {"application_id": application_id, "result": "not_found"}
+            elif application.status != 'pending':
+                results[application_id] = {"application_id": application_id, "result": "skipped",
+                                           "message": f"Application is already '{application.status}'."}
+            elif not application.user or not application.user.ethereum_address:
+                results[application_id] = {"application_id": application_id, "result": "skipped",
+                                           "message": "Applicant does not have an Ethereum address."}
+            elif application.user_id in existing_voter_user_ids:
+                # 与单条审核一致：用户已是选民时只更新申请状态
+                application.status = 'approved'
+                application.reviewed_by_admin_id = current_admin_user.id
+                application.reviewed_at = datetime.now(UTC)
+                results[application_id] = {"application_id": application_id, "result": "approved",
+                                           "message": "User was already a voter."}
+            else:
+                to_register.append(application)
+        db.session.commit()
+
+        contract = get_contract()
+        w3 = get_w3()
+        admin_tx_account = w3.eth.default_account
+        if to_register and not admin_tx_account:
+            return jsonify({"success": False,
+                            "message": "Admin Ethereum account not configured for blockchain transactions."}), 500
+
+        # 2. 按批次发送 registerVoters 交易，先全部发送再统一等待回执
+        chunk_size = current_app.config.get('VOTER_REGISTRATION_CHUNK_SIZE', 100)
+        chunks = [to_register[i:i + chunk_size] for i in range(0, len(to_register), chunk_size)]
+        sent_chunks = []
+        for chunk in chunks:
+            addresses = [application.user.ethereum_address for application in chunk]
+            try:
+                tx_hash = get_nonce_manager().transact(contract.functions.registerVoters(addresses),
+                                                       {'from': admin_tx_account})
+                sent_chunks.append((chunk, tx_hash))
+            except Exception as chain_exc:
+                current_app.logger.error(
+                    f"Failed to send registerVoters transaction for {len(chunk)} voters: {str(chain_exc)}",
+                    exc_info=True)
+                for application in chunk:
+                    results[application.id] = {"application_id": application.id, "result": "failed",
+                                               "message": f"Blockchain registration error: {str(chain_exc)}"}
+
+        # 3. 成功的批次用 bulk_insert_mappings 写入选民记录，并更新申请状态
+        for chunk, tx_hash in sent_chunks:
+            try:
+                tx_receipt = w3.eth.wait_for_transaction_receipt(tx_hash, timeout=120)
+            except Exception as receipt_exc:
+                tx_receipt = None
+                current_app.logger.error(
+                    f"Error waiting for registerVoters receipt {tx_hash.hex()}: {str(receipt_exc)}", exc_info=True)
+
+            if not tx_receipt or tx_receipt.status != 1:
+                current_app.logger.error(
+                    f"Blockchain transaction failed for registering {len(chunk)} voters. TX: {tx_hash.hex()}")
+                for application in chunk:
+                    results[application.id] = {"application_id": application.id, "result": "failed",
+                                               "message": "Blockchain registration failed. Application left pending.",
+                                               "txHash": tx_hash.hex()}
+                continue
+
+            registered_at = datetime.now(UTC)
+            db.session.bulk_insert_mappings(Voter, [{
+                "user_id": application.user_id,
+                "is_registered_on_chain": True,
+                "chain_registration_tx_hash": tx_hash.hex(),
+                "registered_on_chain_at": registered_at
+            } for application in chunk])
+            for application in chunk:
+                application.status = 'approved'
+                application.reviewed_by_admin_id = current_admin_user.id
+                application.reviewed_at = registered_at
+                results[application.id] = {"application_id": application.id, "result": "approved",
+                                           "txHash": tx_hash.hex()}
+            db.session.commit()
+            current_app.logger.info(
+                f"Registered {len(chunk)} voters on blockchain in one transaction. TX: {tx_hash.hex()}")
+
+        results_list = [results[application_id] for application_id in application_ids]
+        approved_count = sum(1 for result in results_list if result["result"] == "approved")
+        return jsonify({
+            "success": True,
+            "message": f"{approved_count} of {len(application_ids)} applications approved.",
+            "approved_count": approved_count,
+            "results": results_list
+        }), 200
+
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error bulk approving voter applications by admin {current_admin_user.userid}: "
+                                 f"{str(e)}", exc_info=True)
+        return jsonify({"success": False, "message": f"An error occurred: {str(e)}"}), 500
+
+
 # --- Voting Activity Management ---
 @admin_bp.route('/voting/period', methods=['POST'])
 @admin_required
@@ -420,40 +570,32 @@ def set_voting_period(current_admin_user):
             f"End {end_time_ts}")
 
         # 1. 在区块链上设置投票周期
-        tx_hash = contract.functions.setVotingPeriod(start_time_ts, end_time_ts).transact({'from': tx_sender_account})
+        tx_hash = get_nonce_manager().transact(contract.functions.setVotingPeriod(start_time_ts, end_time_ts),
+                                               {'from': tx_sender_account})
         tx_receipt = w3.eth.wait_for_transaction_receipt(tx_hash, timeout=120)
 
         if tx_receipt.status == 1:
+            response_cache.invalidate('voting_status', 'election_deadline')
             current_app.logger.info(
                 f"Voting period set successfully on blockchain by admin '{current_admin_user.userid}'. "
                 f"TX: {tx_hash.hex()}")
 
-            # 2. 成功设置链上周期后，安排或更新自动启动任务
+            # 2. 成功设置链上周期后，安排或更新自动启动/结束任务 (固定任务 ID，重新设置时替换旧任务)
             try:
-                run_date = datetime.fromtimestamp(start_time_ts, tz=UTC)
-                job_id = f"auto_start_voting_{start_time_ts}"
-
-                if scheduler.get_job(job_id):
-                    scheduler.remove_job(job_id)
-                    current_app.logger.info(f"Removed existing auto-start job with ID '{job_id}' to reschedule.")
-
-                # 添加新的调度任务
-                scheduler.add_job(
-                    id=job_id,
-                    func=job_start_voting_on_contract,  # 指向你的作业执行函数
-                    trigger='date',
-                    run_date=run_date,
-                    args=[job_id]
-                )
+                run_date = schedule_auto_start(start_time_ts)
+                end_run_date = schedule_auto_end(end_time_ts)
                 current_app.logger.info(
-                    f"Successfully scheduled/updated auto-start for voting at {run_date} (Job ID: {job_id}).")
+                    f"Successfully scheduled/updated auto-start for voting at {run_date} "
+                    f"(Job ID: {AUTO_START_JOB_ID}), auto-end at {end_run_date}.")
 
                 return jsonify({
                     "success": True,
                     "message": "Voting period set successfully on blockchain and auto-start task scheduled/updated.",
                     "txHash": tx_hash.hex(),
-                    "auto_start_job_id": job_id,
-                    "auto_start_scheduled_at": run_date.isoformat()
+                    "auto_start_job_id": AUTO_START_JOB_ID,
+                    "auto_start_scheduled_at": run_date.isoformat(),
+                    "auto_end_job_id": AUTO_END_JOB_ID if end_run_date else None,
+                    "auto_end_scheduled_at": end_run_date.isoformat() if end_run_date else None
                 }), 200
 
             except Exception as schedule_err:
@@ -512,10 +654,11 @@ def start_voting_process(current_admin_user):
         tx_sender_account = w3.eth.default_account
 
         current_app.logger.info(f"Admin '{current_admin_user.userid}' attempting to start voting.")
-        tx_hash = contract.functions.startVoting().transact({'from': tx_sender_account})
+        tx_hash = get_nonce_manager().transact(contract.functions.startVoting(), {'from': tx_sender_account})
         tx_receipt = w3.eth.wait_for_transaction_receipt(tx_hash, timeout=120)
 
         if tx_receipt.status == 1:
+            response_cache.invalidate('voting_status', 'election_deadline')
             current_app.logger.info(
                 f"Voting started successfully by admin '{current_admin_user.userid}'. TX: {tx_hash.hex()}")
             return jsonify({"success": True, "message": "Voting started successfully.", "txHash": tx_hash.hex()}), 200
@@ -546,12 +689,19 @@ def end_voting_process(current_admin_user):
         tx_sender_account = w3.eth.default_account
 
         current_app.logger.info(f"Admin '{current_admin_user.userid}' attempting to end voting.")
-        tx_hash = contract.functions.endVoting().transact({'from': tx_sender_account})
+        tx_hash = get_nonce_manager().transact(contract.functions.endVoting(), {'from': tx_sender_account})
         tx_receipt = w3.eth.wait_for_transaction_receipt(tx_hash, timeout=120)
 
         if tx_receipt.status == 1:
+            response_cache.invalidate('voting_status', 'election_deadline')
             current_app.logger.info(
                 f"Voting ended successfully by admin '{current_admin_user.userid}'. TX: {tx_hash.hex()}")
+            cancel_job(AUTO_END_JOB_ID)
+            try:
+                # 立即定稿结果；失败时由定时任务重试
+                finalize_election_results()
+            except Exception as finalize_err:
+                current_app.logger.error(f"Failed to finalize election results: {finalize_err}", exc_info=True)
             return jsonify({"success": True, "message": "Voting ended successfully.", "txHash": tx_hash.hex()}), 200
         else:
             current_app.logger.error(f"Failed to end voting. TX: {tx_hash.hex()}, Receipt: {tx_receipt}")
@@ -581,14 +731,19 @@ def extend_voting_deadline_route(current_admin_user):  # Renamed function for cl
         tx_sender_account = w3.eth.default_account
 
         current_app.logger.info(f"Admin '{current_admin_user.userid}' extending voting deadline to: {new_end_time_ts}")
-        tx_hash = contract.functions.extendVotingDeadline(new_end_time_ts).transact({'from': tx_sender_account})
+        tx_hash = get_nonce_manager().transact(contract.functions.extendVotingDeadline(new_end_time_ts),
+                                               {'from': tx_sender_account})
         tx_receipt = w3.eth.wait_for_transaction_receipt(tx_hash, timeout=120)
 
         if tx_receipt.status == 1:
+            response_cache.invalidate('voting_status', 'election_deadline')
             current_app.logger.info(
                 f"Voting deadline extended successfully by admin '{current_admin_user.userid}'. TX: {tx_hash.hex()}")
-            return jsonify(
-                {"success": True, "message": "Voting deadline extended successfully.", "txHash": tx_hash.hex()}), 200
+            # 自动结束任务随新的截止时间改期
+            end_run_date = schedule_auto_end(new_end_time_ts)
+            return jsonify({"success": True, "message": "Voting deadline extended successfully.",
+                            "txHash": tx_hash.hex(),
+                            "auto_end_scheduled_at": end_run_date.isoformat() if end_run_date else None}), 200
         else:
             current_app.logger.error(f"Failed to extend voting deadline. TX: {tx_hash.hex()}, Receipt: {tx_receipt}")
             return jsonify({"success": False,
@@ -608,12 +763,9 @@ def extend_voting_deadline_route(current_admin_user):  # Renamed function for cl
 def get_contract_voting_status(current_admin_user):
     """获取合约的详细状态，供管理员前端页面使用"""
     try:
-        contract = get_contract()
-        # (phase, startTime, endTime, currentTime)
-        status_data = contract.functions.getVotingStatus().call()
-
-        # 新增：获取候选人数量
-        candidate_count = contract.functions.getCandidatesCount().call()
+        # (phase, startTime, endTime, currentTime, candidatesCount)，一次 RPC 往返
+        status_data = get_contract_snapshot()
+        candidate_count = status_data[4]
 
         phase_map = {0: "Pending", 1: "Active", 2: "Concluded"}
 
@@ -632,41 +784,68 @@ def get_contract_voting_status(current_admin_user):
         return jsonify({"success": False, "message": f"An error occurred: {str(e)}"}), 500
 
 
-def job_start_voting_on_contract(voting_id_or_job_id):
-    # 调用 create_app 时，不初始化调度器
-    flask_app = create_app(init_scheduler=False) 
-    
-    with flask_app.app_context():
-        try:
-            flask_app.logger.info(
-                f"APScheduler: Attempting to auto-start voting via job (ID: {voting_id_or_job_id}).")
-            
-            contract = get_contract()
-            w3 = get_w3()
-            tx_sender_account = w3.eth.default_account
-
-            status_data = contract.functions.getVotingStatus().call()
-            current_phase_from_contract = status_data[0]
-            contract_start_time = status_data[1]
-            contract_end_time = status_data[2]
-            current_block_time = status_data[3]
-
-            if current_phase_from_contract == 0:  # VotingPhase.Pending
-                flask_app.logger.info(
-                    f"Contract phase is Pending. Attempting to call startVoting() for job {voting_id_or_job_id}.")
-                
-                tx_hash = contract.functions.startVoting().transact({'from': tx_sender_account, 'gas': 300000})
-                flask_app.logger.info(
-                    f"APScheduler: Auto-start voting transaction sent for job {voting_id_or_job_id}. "
-                    f"TX Hash: {tx_hash.hex()}")
-            else:
-                flask_app.logger.warning(
-                    f"APScheduler: Auto-start voting job {voting_id_or_job_id} skipped. "
-                    f"Contract phase is not Pending (Phase: {current_phase_from_contract}). "
-                    f"Current block time: {current_block_time}, Contract start: {contract_start_time}, "
-                    f"Contract end: {contract_end_time}")
-
-        except Exception as e:
-            flask_app.logger.error(
-                f"APScheduler: Error in job_start_voting_on_contract (Job ID: {voting_id_or_job_id}): {str(e)}",
-                exc_info=True)
+@admin_bp.route('/rpc/stats', methods=['GET'])
+@admin_required
+def get_rpc_stats(current_admin_user):
+    """获取各 RPC 节点的延迟与错误统计，以及 gas 预估/手续费缓存的命中情况"""
+    try:
+        return jsonify({"success": True, "endpoints": get_rpc_endpoint_stats(),
+                        "gas_policy": get_gas_policy().get_stats()}), 200
+    except Exception as e:
+        current_app.logger.error(f"Error fetching RPC stats by admin {current_admin_user.userid}: {str(e)}",
+                                 exc_info=True)
+        return jsonify({"success": False, "message": f"An error occurred: {str(e)}"}), 500
+
+
+@admin_bp.route('/reconciliation', methods=['GET'])
+@admin_required
+def get_reconciliation_report(current_admin_user):
+    """获取最近一次链上/数据库对账的结果"""
+    return jsonify({"success": True, "report": get_last_report()}), 200
+
+
+@admin_bp.route('/reconciliation/run', methods=['POST'])
+@admin_required
+def run_reconciliation(current_admin_user):
+    """立即执行一次链上/数据库对账"""
+    try:
+        current_app.logger.info(f"Admin '{current_admin_user.userid}' triggered chain state reconciliation.")
+        return jsonify({"success": True, "report": reconcile_chain_state()}), 200
+    except Exception as e:
+        current_app.logger.error(f"Error reconciling chain state by admin {current_admin_user.userid}: {str(e)}",
+                                 exc_info=True)
+        return jsonify({"success": False, "message": f"An error occurred: {str(e)}"}), 500
+
+
+@admin_bp.route('/export/<table>', methods=['GET'])
+@admin_required
+def export_table(current_admin_user, table):
+    """流式导出 votes / voters / voter_applications 表 (?format=csv|ndjson)
+
+    可选过滤: voter_applications 支持 ?status=，voters 支持 ?registered_on_chain=true|false。
+    """
+    if table not in EXPORT_QUERIES:
+        return jsonify({"success": False,
+                        "message": f"Unknown export table '{table}'. "
+                                   f"Available: {', '.join(EXPORT_QUERIES)}."}), 404
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"success": False, "message": "format must be 'csv' or 'ndjson'."}), 400
+
+    registered_on_chain = request.args.get('registered_on_chain')
+    filters = {
+        'status': request.args.get('status'),
+        'registered_on_chain': registered_on_chain.lower() == 'true' if registered_on_chain else None
+    }
+    current_app.logger.info(f"Admin '{current_admin_user.userid}' exporting table '{table}' as {export_format}.")
+
+    filename = f"{table}-{datetime.now(UTC).strftime('%Y%m%d%H%M%S')}.{export_format}"
+    response = Response(
+        stream_with_context(stream_export(table, export_format, filters,
+                                          yield_per=current_app.config.get('EXPORT_YIELD_PER', 1000))),
+        mimetype=EXPORT_FORMATS[export_format]
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['X-Accel-Buffering'] = 'no'  # 避免 nginx 缓冲整个导出文件
+    return response
+
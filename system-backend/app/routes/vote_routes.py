@@ -1,41 +1,68 @@
 # app/routes/vote_routes.py
 import json
+import queue
+
 import web3.exceptions
-from flask import Blueprint, jsonify, current_app, request
+from flask import Blueprint, Response, jsonify, current_app, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime, UTC  
 
 from .. import db  
-from ..models.models import CandidateDetails, Voter, Votes, User  
-from ..utils.web3_utils import get_contract, get_w3
+from ..models.models import CandidateDetails, Voter, Votes, User, PendingVote
+from ..utils.web3_utils import check_node_health, get_contract, get_w3, get_candidates_on_chain
+from ..utils.gas_policy import get_gas_policy
+from ..utils.tally_cache import get_tally_cache
+from ..utils.vote_pipeline import submit_vote_async
+from ..utils.response_cache import response_cache
+from ..utils.event_stream import get_event_broadcaster
+from ..utils.results_finalizer import get_final_result
 
 vote_bp = Blueprint('vote_bp', __name__, url_prefix='/api')
 
 
+@vote_bp.route('/health', methods=['GET'])
+def health_check():
+    """就绪检查: Web3 预热完成且节点当前可用时返回 200，否则返回 503 (负载均衡器据此决定是否转发流量)"""
+    try:
+        block_number = check_node_health()
+    except Exception as e:
+        return jsonify({"success": False, "ready": False, "message": str(e)}), 503
+    return jsonify({"success": True, "ready": True, "block_number": block_number}), 200
+
+
 @vote_bp.route('/candidates', methods=['GET'])
+@response_cache.cached('candidates')
 def get_all_candidates():
-    """获取所有的候选人信息 (从合约和数据库)"""
+    """获取所有的候选人信息 (票数来自事件索引缓存，详情来自数据库)"""
     try:
-        contract = get_contract()
         candidates_list = []
 
-        # 1. 从智能合约获取候选人数量
-        candidate_count_on_chain = contract.functions.getCandidatesCount().call()
+        # 1. 从事件缓存获取候选人及票数，只需增量拉取新区块的日志
+        try:
+            candidates_on_chain, block_number = get_tally_cache().snapshot()
+        except Exception as cache_err:
+            # 事件缓存不可用时退回到批量读取合约状态
+            current_app.logger.warning(f"Tally cache unavailable, falling back to batched contract reads: {cache_err}")
+            block_number = get_w3().eth.block_number
+            candidates_on_chain = get_candidates_on_chain()
 
-        current_app.logger.info(f"Found {candidate_count_on_chain} candidates on the smart contract.")
+        current_app.logger.info(
+            f"Found {len(candidates_on_chain)} candidates in tally cache at block {block_number}.")
 
-        # 2. 遍历从合约获取每个候选人的链上信息
-        for i in range(candidate_count_on_chain):
-            # getCandidate 返回 (string memory name, uint voteCount)
-            name_on_chain, vote_count_on_chain = contract.functions.getCandidate(i).call()
+        # 2. 一次查询取出所有候选人的数据库详细信息
+        names_on_chain = [name for name, _ in candidates_on_chain]
+        details_by_name = {
+            detail.name: detail
+            for detail in CandidateDetails.query.filter(CandidateDetails.name.in_(names_on_chain)).all()
+        } if names_on_chain else {}
 
-            # 3. 从数据库中查找对应的候选人详细信息
-            candidate_detail_db = CandidateDetails.query.filter_by(name=name_on_chain).first()
+        for i, (name_on_chain, vote_count_on_chain) in enumerate(candidates_on_chain):
+            candidate_detail_db = details_by_name.get(name_on_chain)
 
             candidate_info = {
                 "id_on_chain": i,  # 候选人在合约数组中的索引
                 "name": name_on_chain,
-                "vote_count_from_chain": vote_count_on_chain,  # 来自合约的票数
+                "vote_count_from_chain": vote_count_on_chain,  # 来自合约事件的票数
                 "description": candidate_detail_db.description if candidate_detail_db else None,
                 "image_url": candidate_detail_db.image_url if candidate_detail_db else None,
                 "slogan": candidate_detail_db.slogan if candidate_detail_db else None,
@@ -55,7 +82,7 @@ def get_all_candidates():
 
             candidates_list.append(candidate_info)
 
-        return jsonify({"success": True, "candidates": candidates_list}), 200
+        return jsonify({"success": True, "candidates": candidates_list, "block_number": block_number}), 200
 
     except Exception as e:
         current_app.logger.error(f"Error fetching all candidates: {str(e)}", exc_info=True)
@@ -63,6 +90,7 @@ def get_all_candidates():
 
 
 @vote_bp.route('/voting_status', methods=['GET'])
+@response_cache.cached('voting_status')
 def get_voting_status_route():
     """获取公共投票状态信息"""
     try:
@@ -119,6 +147,7 @@ def get_voting_status_route():
 
 
 @vote_bp.route('/election_deadline', methods=['GET'])
+@response_cache.cached('election_deadline')
 def get_election_deadline():
     """获取合约的 votingDeadline"""
     try:
@@ -130,6 +159,57 @@ def get_election_deadline():
         return jsonify({"success": False, "message": str(e)}), 500
 
 
+@vote_bp.route('/results/final', methods=['GET'])
+def get_final_results():
+    """获取投票结束后定稿的结果快照 (只读数据库，不访问区块链；内容不可变，允许长期缓存)"""
+    try:
+        result = get_final_result()
+        if not result:
+            response = jsonify({"success": False, "message": "Election results have not been finalized yet."})
+            response.status_code = 404
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+
+        response = jsonify({"success": True, "result": result.to_dict()})
+        response.set_etag(result.snapshot_hash)
+        response.headers['Cache-Control'] = \
+            f"public, max-age={current_app.config.get('FINAL_RESULTS_MAX_AGE_SECONDS', 31536000)}, immutable"
+        return response.make_conditional(request)
+    except Exception as e:
+        current_app.logger.error(f"Error fetching final results: {str(e)}", exc_info=True)
+        return jsonify({"success": False, "message": f"An error occurred while fetching final results: {str(e)}"}), 500
+
+
+@vote_bp.route('/stream', methods=['GET'])
+def stream_events():
+    """Server-Sent Events: 推送票数变化 (tally) 和投票阶段变化 (phase/voting_period)
+
+    所有连接共享同一个链上事件订阅。这里的生成器在等待事件时占用一个 WSGI 线程，
+    大量长连接请使用 ASGI 模式 (uvicorn asgi:app)，由 app/asgi_app.py 中的异步路由提供同一接口。
+    """
+    broadcaster = get_event_broadcaster()
+    heartbeat_interval = current_app.config.get('STREAM_HEARTBEAT_SECONDS', 15)
+    subscriber = broadcaster.subscribe()
+
+    def generate():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = subscriber.get(timeout=heartbeat_interval)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            broadcaster.unsubscribe(subscriber)
+
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # 避免 nginx 缓冲事件流
+    return response
+
+
 @vote_bp.route('/vote', methods=['POST'])
 @jwt_required()  # <--- 需要登录才能投票
 def cast_vote():
@@ -172,6 +252,13 @@ def cast_vote():
                 f"vote ID {existing_vote_db.id} in DB. Contract should prevent re-vote unless revoked.")
             return jsonify({"success": False, "message": "Voter has already voted (according to DB)."}), 409
 
+        # 异步模式下，还需要检查是否有尚未确认的投票交易
+        pending_vote_db = PendingVote.query.filter_by(voter_id=voter_record.id, status='pending').first()
+        if pending_vote_db:
+            return jsonify({"success": False,
+                            "message": "A previous vote of this voter is still waiting for confirmation.",
+                            "ticket_id": pending_vote_db.ticket_id}), 409
+
         contract = get_contract()
         w3 = get_w3()
 
@@ -186,7 +273,21 @@ def cast_vote():
         except ValueError:
             return jsonify({"success": False, "message": "Invalid candidate_index_on_chain format."}), 400
 
-        tx_hash = contract.functions.vote(candidate_index_int).transact({'from': voter_eth_address, 'gas': 500000})
+        # 异步模式：只发送交易并登记待确认投票，由后台任务批量检查回执
+        if current_app.config.get('VOTE_SUBMISSION_MODE') == 'async':
+            pending_vote = submit_vote_async(voter_record, voter_eth_address, candidate_index_int)
+            current_app.logger.info(
+                f"Vote transaction by User '{user.userid}' submitted asynchronously. "
+                f"Ticket: {pending_vote.ticket_id}, TX Hash: {pending_vote.transaction_hash}")
+            return jsonify({
+                "success": True,
+                "message": "Vote transaction submitted. Poll the ticket status for confirmation.",
+                "ticket_id": pending_vote.ticket_id,
+                "txHash": pending_vote.transaction_hash
+            }), 202
+
+        vote_function = contract.functions.vote(candidate_index_int)
+        tx_hash = vote_function.transact(get_gas_policy().apply(vote_function, {'from': voter_eth_address}))
         tx_receipt = w3.eth.wait_for_transaction_receipt(tx_hash, timeout=120)
 
         if tx_receipt.status != 1:
@@ -238,6 +339,7 @@ def cast_vote():
         )
         db.session.add(new_vote_db)
         db.session.commit()
+        response_cache.invalidate('candidates')
         current_app.logger.info(
             f"Vote by User '{user.userid}' (VoterRecordID {voter_record.id}) for Candidate '{candidate_detail_db.name}'"
             f"(ID {candidate_detail_db.id}) recorded in database (VoteID: {new_vote_db.id}).")
@@ -292,6 +394,26 @@ def cast_vote():
         return jsonify({"success": False, "message": f"An error occurred: {str(e)}"}), 500
 
 
+@vote_bp.route('/vote/tickets/<ticket_id>', methods=['GET'])
+@jwt_required()
+def get_vote_ticket_status(ticket_id):
+    """查询异步投票票据的确认状态"""
+    try:
+        current_user_identity = json.loads(get_jwt_identity())
+        user_db_id = current_user_identity.get('id')
+
+        pending_vote = PendingVote.query.filter_by(ticket_id=ticket_id).first()
+        voter_record = Voter.query.filter_by(user_id=user_db_id).first()
+        # 只允许查询自己的票据
+        if not pending_vote or not voter_record or pending_vote.voter_id != voter_record.id:
+            return jsonify({"success": False, "message": "Vote ticket not found."}), 404
+
+        return jsonify({"success": True, "ticket": pending_vote.to_dict()}), 200
+    except Exception as e:
+        current_app.logger.error(f"Error fetching vote ticket {ticket_id}: {str(e)}", exc_info=True)
+        return jsonify({"success": False, "message": f"An error occurred: {str(e)}"}), 500
+
+
 @vote_bp.route('/revoke_vote', methods=['POST'])
 @jwt_required()  # <--- 需要登录才能撤销
 def revoke_vote():
@@ -328,7 +450,8 @@ def revoke_vote():
             f"User '{user.userid}' (ETH: {voter_eth_address}, "
             f"VoterRecordID: {voter_record.id}) attempting to revoke vote.")
 
-        tx_hash = contract.functions.revokeVote().transact({'from': voter_eth_address, 'gas': 300000})
+        revoke_function = contract.functions.revokeVote()
+        tx_hash = revoke_function.transact(get_gas_policy().apply(revoke_function, {'from': voter_eth_address}))
         tx_receipt = w3.eth.wait_for_transaction_receipt(tx_hash, timeout=120)
 
         if tx_receipt.status != 1:
@@ -346,6 +469,7 @@ def revoke_vote():
         db_vote_id_deleted = vote_to_revoke_db.id
         db.session.delete(vote_to_revoke_db)
         db.session.commit()
+        response_cache.invalidate('candidates')
         current_app.logger.info(
             f"Vote record (ID: {db_vote_id_deleted}) for User '{user.userid}' "
             f"(VoterRecordID {voter_record.id}) deleted from database.")
@@ -0,0 +1,90 @@
+# app/utils/address_pool.py
+import threading
+from datetime import datetime, UTC
+
+from sqlalchemy import event, update
+from sqlalchemy.exc import IntegrityError
+
+from .. import db
+from ..models.models import EthAddressPool, User
+from .pagination import keyset_paginate
+from .web3_utils import get_ganache_accounts, get_w3
+
+_sync_lock = threading.Lock()
+_synced = False
+
+
+def sync_address_pool():
+    """把尚未入池的 Ganache 账户写入地址池 (管理员账户除外)，已被用户使用的地址直接标记为已占用；返回新增数量"""
+    admin_address = get_w3().eth.default_account
+    existing = {address for (address,) in db.session.query(EthAddressPool.address).all()}
+    missing = [address for address in get_ganache_accounts() if address not in existing and address != admin_address]
+    if not missing:
+        return 0
+
+    owners = dict(db.session.query(User.ethereum_address, User.id).filter(User.ethereum_address.in_(missing)).all())
+    now = datetime.now(UTC)
+    db.session.add_all([
+        EthAddressPool(address=address, user_id=owners.get(address), claimed_at=now if address in owners else None)
+        for address in missing
+    ])
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # 其它服务进程同时完成了初始化
+        db.session.rollback()
+        return 0
+    return len(missing)
+
+
+def ensure_address_pool():
+    """每个进程首次使用地址池时同步一次 Ganache 账户列表"""
+    global _synced
+    if _synced:
+        return
+    with _sync_lock:
+        if not _synced:
+            sync_address_pool()
+            _synced = True
+
+
+def list_available_addresses(cursor=None, limit=50):
+    """分页返回尚未被占用的地址 ([地址, ...], next_cursor)，按 (user_id, id) 索引做范围扫描"""
+    ensure_address_pool()
+    query = EthAddressPool.query.filter(EthAddressPool.user_id.is_(None))
+    rows, next_cursor = keyset_paginate(query, [EthAddressPool.id], cursor=cursor, limit=limit)
+    return [row.address for row in rows], next_cursor
+
+
+def claim_address(user, address=None):
+    """在当前事务中为新用户占用地址 (未指定时取任意一个可用地址)，返回占用的地址；已被占用或不在池中时返回 None
+
+    使用 SELECT ... FOR UPDATE SKIP LOCKED：并发注册不会等待彼此的行锁，也不会占用同一个地址。
+    占用成功时把 user 加入会话并写入 ethereum_address；调用方负责提交事务，使地址占用与用户创建原子地生效。
+    """
+    # 首次同步会提交事务，必须在写入用户之前完成
+    ensure_address_pool()
+    query = EthAddressPool.query.filter(EthAddressPool.user_id.is_(None))
+    if address:
+        query = query.filter(EthAddressPool.address == address)
+    row = query.order_by(EthAddressPool.id).with_for_update(skip_locked=True).first()
+    if row is None:
+        return None
+
+    user.ethereum_address = row.address
+    db.session.add(user)
+    db.session.flush()
+    row.user_id = user.id
+    row.claimed_at = datetime.now(UTC)
+    return row.address
+
+
+def _release_on_user_deleted(mapper, connection, target):
+    # 数据库未强制外键 (例如 SQLite) 时同样归还地址
+    connection.execute(update(EthAddressPool).where(EthAddressPool.user_id == target.id)
+                       .values(user_id=None, claimed_at=None))
+
+
+def init_address_pool(app):
+    if not event.contains(User, 'after_delete', _release_on_user_deleted):
+        event.listen(User, 'after_delete', _release_on_user_deleted)
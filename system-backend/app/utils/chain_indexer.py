@@ -0,0 +1,192 @@
+# app/utils/chain_indexer.py
+import time
+from datetime import datetime, UTC
+
+from flask import current_app
+from hexbytes import HexBytes
+from web3 import Web3
+from web3.exceptions import TransactionNotFound
+
+from .. import db
+from ..models.models import CandidateDetails, IndexerCursor, User, Voter, Votes, VotingPeriod
+from .event_stream import VOTING_PERIOD_SET_TOPIC
+from .tally_cache import CANDIDATE_ADDED_TOPIC, VOTED_TOPIC, VOTE_REVOKED_TOPIC
+from .web3_utils import get_contract, get_w3
+
+VOTER_REGISTERED_TOPIC = Web3.keccak(text="VoterRegistered(address)")
+
+INDEXED_TOPICS = [CANDIDATE_ADDED_TOPIC, VOTED_TOPIC, VOTE_REVOKED_TOPIC, VOTER_REGISTERED_TOPIC,
+                  VOTING_PERIOD_SET_TOPIC]
+
+
+class ChainIndexer:
+    """按区块区间拉取合约事件，幂等地写入数据库，并持久化已处理的区块游标
+
+    每个区块区间的数据库写入与游标更新在同一个事务中提交，
+    因此进程在任意时刻崩溃，重启后都会从最后一次完整提交的区块继续。
+    """
+
+    def __init__(self, name='default', block_range=5000, confirmations=0):
+        self.name = name
+        self.block_range = block_range
+        self.confirmations = confirmations
+        self._candidate_names = {}  # 链上候选人索引 -> 名称
+        self._block_times = {}  # 区块号 -> 区块时间
+
+    def _get_cursor(self):
+        cursor = IndexerCursor.query.filter_by(name=self.name).first()
+        if not cursor:
+            cursor = IndexerCursor(name=self.name, last_block=-1)
+            db.session.add(cursor)
+            db.session.commit()
+        return cursor
+
+    def _candidate_name(self, candidate_id):
+        if candidate_id not in self._candidate_names:
+            self._candidate_names[candidate_id], _ = get_contract().functions.getCandidate(candidate_id).call()
+        return self._candidate_names[candidate_id]
+
+    def _block_time(self, block_number):
+        if block_number not in self._block_times:
+            timestamp = get_w3().eth.get_block(block_number)['timestamp']
+            self._block_times[block_number] = datetime.fromtimestamp(timestamp, tz=UTC)
+        return self._block_times[block_number]
+
+    @staticmethod
+    def _voter_for_address(address, create=False):
+        user = User.query.filter_by(ethereum_address=address).first()
+        if not user:
+            return None
+        voter = Voter.query.filter_by(user_id=user.id).first()
+        if not voter and create:
+            voter = Voter(user_id=user.id)
+            db.session.add(voter)
+        return voter
+
+    def _on_candidate_added(self, args, log):
+        self._candidate_names[args['candidateId']] = args['candidateName']
+        if not CandidateDetails.query.filter_by(name=args['candidateName']).first():
+            db.session.add(CandidateDetails(name=args['candidateName']))
+
+    def _on_voter_registered(self, args, log):
+        voter = self._voter_for_address(args['voterAddress'], create=True)
+        if voter is None:
+            current_app.logger.warning(f"Indexer: VoterRegistered for unknown address {args['voterAddress']}.")
+            return
+        if not voter.is_registered_on_chain:
+            voter.is_registered_on_chain = True
+            voter.chain_registration_tx_hash = log['transactionHash'].hex()
+            voter.registered_on_chain_at = self._block_time(log['blockNumber'])
+
+    def _on_voted(self, args, log):
+        voter = self._voter_for_address(args['voterAddress'])
+        candidate = CandidateDetails.query.filter_by(name=self._candidate_name(args['candidateId'])).first()
+        if voter is None or candidate is None:
+            current_app.logger.warning(
+                f"Indexer: cannot map Voted event (voter {args['voterAddress']}, "
+                f"candidate {args['candidateId']}) to database rows.")
+            return
+
+        tx_hash = log['transactionHash'].hex()
+        existing_vote = Votes.query.filter_by(voter_id=voter.id).first()
+        if existing_vote and existing_vote.transaction_hash == tx_hash:
+            return
+        if existing_vote:
+            if not self._vote_precedes(existing_vote, log):
+                # 重新索引或区间重叠时重放到了更早的事件，保留数据库中较新的投票
+                return
+            # 数据库中残留了旧的投票 (例如撤销后重新投票)，以链上事件为准
+            db.session.delete(existing_vote)
+            db.session.flush()
+        db.session.add(Votes(
+            voter_id=voter.id,
+            candidate_id=candidate.id,
+            transaction_hash=tx_hash,
+            block_number=log['blockNumber'],
+            voted_at_on_chain=self._block_time(log['blockNumber'])
+        ))
+
+    @staticmethod
+    def _vote_precedes(vote, log):
+        """数据库中的投票是否发生在该事件之前；同一区块内按交易在区块中的位置比较"""
+        if vote.block_number is None:
+            return True
+        if vote.block_number != log['blockNumber']:
+            return vote.block_number < log['blockNumber']
+        # votes 表不记录交易位置，同一区块内的先后 (很少出现) 向节点查询
+        try:
+            tx = get_w3().eth.get_transaction(HexBytes(vote.transaction_hash))
+        except TransactionNotFound:
+            # 数据库中的交易不在链上，以链上事件为准
+            return True
+        return tx['transactionIndex'] < log['transactionIndex']
+
+    def _on_vote_revoked(self, args, log):
+        voter = self._voter_for_address(args['voterAddress'])
+        if voter is None:
+            return
+        existing_vote = Votes.query.filter_by(voter_id=voter.id).first()
+        # 只删除撤销事件之前产生的投票，避免重放时误删之后的新投票
+        if existing_vote and self._vote_precedes(existing_vote, log):
+            db.session.delete(existing_vote)
+
+    def _on_voting_period_set(self, args, log):
+        tx_hash = log['transactionHash'].hex()
+        if not VotingPeriod.query.filter_by(transaction_hash=tx_hash).first():
+            db.session.add(VotingPeriod(start_time=args['startTime'], end_time=args['endTime'],
+                                        transaction_hash=tx_hash, block_number=log['blockNumber']))
+
+    def _apply_log(self, contract, log):
+        handlers = {
+            CANDIDATE_ADDED_TOPIC: (contract.events.CandidateAdded, self._on_candidate_added),
+            VOTER_REGISTERED_TOPIC: (contract.events.VoterRegistered, self._on_voter_registered),
+            VOTED_TOPIC: (contract.events.Voted, self._on_voted),
+            VOTE_REVOKED_TOPIC: (contract.events.VoteRevoked, self._on_vote_revoked),
+            VOTING_PERIOD_SET_TOPIC: (contract.events.VotingPeriodSet, self._on_voting_period_set),
+        }
+        event, handler = handlers[log['topics'][0]]
+        handler(event().process_log(log)['args'], log)
+        # 让同一区间内后续事件的查询能看到之前的写入
+        db.session.flush()
+
+    def run_once(self):
+        """处理从游标到最新 (减去确认数) 区块之间的所有事件，返回处理的日志数量"""
+        w3 = get_w3()
+        contract = get_contract()
+        cursor = self._get_cursor()
+        target_block = w3.eth.block_number - self.confirmations
+        processed = 0
+
+        from_block = cursor.last_block + 1
+        while from_block <= target_block:
+            to_block = min(from_block + self.block_range - 1, target_block)
+            logs = w3.eth.get_logs({
+                'address': contract.address,
+                'fromBlock': from_block,
+                'toBlock': to_block,
+                'topics': [[Web3.to_hex(topic) for topic in INDEXED_TOPICS]]
+            })
+            try:
+                for log in logs:
+                    self._apply_log(contract, log)
+                cursor.last_block = to_block
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            processed += len(logs)
+            current_app.logger.info(
+                f"Indexer '{self.name}': processed {len(logs)} events in blocks {from_block}-{to_block}.")
+            from_block = to_block + 1
+            self._block_times.clear()
+
+        return processed
+
+    def run_forever(self, poll_interval=2):
+        current_app.logger.info(f"Indexer '{self.name}' started.")
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                current_app.logger.error(f"Indexer '{self.name}' error: {str(e)}", exc_info=True)
+            time.sleep(poll_interval)
@@ -0,0 +1,161 @@
+# app/utils/event_stream.py
+import asyncio
+import queue
+import threading
+import time
+
+from web3 import Web3
+
+from .tally_cache import CANDIDATE_ADDED_TOPIC, VOTED_TOPIC, VOTE_REVOKED_TOPIC
+from .web3_utils import get_contract, get_w3
+
+VOTING_PERIOD_SET_TOPIC = Web3.keccak(text="VotingPeriodSet(uint256,uint256)")
+VOTING_STARTED_TOPIC = Web3.keccak(text="VotingStarted(uint256)")
+VOTING_ENDED_TOPIC = Web3.keccak(text="VotingEnded(uint256)")
+
+STREAM_TOPICS = [CANDIDATE_ADDED_TOPIC, VOTED_TOPIC, VOTE_REVOKED_TOPIC, VOTING_PERIOD_SET_TOPIC,
+                 VOTING_STARTED_TOPIC, VOTING_ENDED_TOPIC]
+
+
+class EventBroadcaster:
+    """共享的链上事件订阅：一个后台线程轮询合约日志，把票数变化和阶段变化推送给所有 SSE 客户端
+
+    无论连接多少个客户端，对节点的请求量都只取决于轮询间隔。
+    """
+
+    def __init__(self, poll_interval=1.0, queue_size=256):
+        self.poll_interval = poll_interval
+        self.queue_size = queue_size
+        self.logger = None
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._thread = None
+        self._last_block = None
+
+    def subscribe(self):
+        return self._add_subscriber(queue.Queue(maxsize=self.queue_size))
+
+    def subscribe_async(self, loop=None):
+        """供 ASGI 路由使用的 asyncio.Queue 订阅：事件由轮询线程投递到事件循环，等待时不占用线程"""
+        subscriber = asyncio.Queue(maxsize=self.queue_size)
+        subscriber.loop = loop or asyncio.get_running_loop()
+        return self._add_subscriber(subscriber)
+
+    def _add_subscriber(self, subscriber):
+        with self._lock:
+            self._subscribers.add(subscriber)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='chain-event-broadcaster', daemon=True)
+                self._thread.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            if isinstance(subscriber, asyncio.Queue):
+                try:
+                    subscriber.loop.call_soon_threadsafe(self._offer_async, subscriber, event)
+                except RuntimeError:
+                    # 事件循环已关闭，连接随之结束
+                    self.unsubscribe(subscriber)
+                continue
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                # 客户端消费过慢：丢弃积压的事件，通知其重新拉取完整数据
+                with subscriber.mutex:
+                    subscriber.queue.clear()
+                subscriber.put_nowait({'type': 'resync'})
+
+    @staticmethod
+    def _offer_async(subscriber, event):
+        # 在事件循环线程中执行，与 subscriber.get() 之间无需加锁
+        if subscriber.full():
+            while not subscriber.empty():
+                subscriber.get_nowait()
+            event = {'type': 'resync'}
+        subscriber.put_nowait(event)
+
+    @staticmethod
+    def _to_event(contract, log):
+        topic = log['topics'][0]
+        block_number = log['blockNumber']
+        if topic == VOTED_TOPIC:
+            args = contract.events.Voted().process_log(log)['args']
+            return {'type': 'tally', 'candidate_id': args['candidateId'], 'delta': 1, 'block_number': block_number}
+        if topic == VOTE_REVOKED_TOPIC:
+            args = contract.events.VoteRevoked().process_log(log)['args']
+            return {'type': 'tally', 'candidate_id': args['candidateId'], 'delta': -1, 'block_number': block_number}
+        if topic == CANDIDATE_ADDED_TOPIC:
+            args = contract.events.CandidateAdded().process_log(log)['args']
+            return {'type': 'candidate_added', 'candidate_id': args['candidateId'], 'name': args['candidateName'],
+                    'block_number': block_number}
+        if topic == VOTING_PERIOD_SET_TOPIC:
+            args = contract.events.VotingPeriodSet().process_log(log)['args']
+            return {'type': 'voting_period', 'startTime': args['startTime'], 'endTime': args['endTime'],
+                    'block_number': block_number}
+        if topic == VOTING_STARTED_TOPIC:
+            args = contract.events.VotingStarted().process_log(log)['args']
+            return {'type': 'phase', 'phase': 'Active', 'phase_code': 1, 'startTime': args['startTime'],
+                    'block_number': block_number}
+        args = contract.events.VotingEnded().process_log(log)['args']
+        return {'type': 'phase', 'phase': 'Concluded', 'phase_code': 2, 'endTime': args['endTime'],
+                'block_number': block_number}
+
+    def poll(self):
+        w3 = get_w3()
+        contract = get_contract()
+        latest_block = w3.eth.block_number
+        if self._last_block is None or latest_block < self._last_block:
+            # 首次启动或链被重置：只推送之后的新事件
+            self._last_block = latest_block
+            return
+        if latest_block == self._last_block:
+            return
+
+        logs = w3.eth.get_logs({
+            'address': contract.address,
+            'fromBlock': self._last_block + 1,
+            'toBlock': latest_block,
+            'topics': [[Web3.to_hex(topic) for topic in STREAM_TOPICS]]
+        })
+        for log in logs:
+            self.publish(self._to_event(contract, log))
+        self._last_block = latest_block
+
+    def _run(self):
+        while True:
+            with self._lock:
+                # 没有客户端时停止轮询，下一个订阅者会重新启动线程
+                if not self._subscribers:
+                    self._thread = None
+                    self._last_block = None
+                    return
+            try:
+                self.poll()
+            except Exception as e:
+                if self.logger:
+                    self.logger.error(f"Chain event broadcaster error: {str(e)}", exc_info=True)
+            time.sleep(self.poll_interval)
+
+
+event_broadcaster = EventBroadcaster()
+
+
+def init_event_stream(app):
+    event_broadcaster.poll_interval = app.config.get('STREAM_POLL_INTERVAL_SECONDS', 1.0)
+    event_broadcaster.queue_size = app.config.get('STREAM_CLIENT_QUEUE_SIZE', 256)
+    event_broadcaster.logger = app.logger
+
+
+def get_event_broadcaster():
+    return event_broadcaster
@@ -0,0 +1,122 @@
+# app/utils/export.py
+import csv
+import io
+import json
+from datetime import datetime
+
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+
+from .. import db
+from ..models.models import CandidateDetails, User, Voter, VoterApplication, Votes
+
+EXPORT_FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+
+def _votes_query(filters):
+    return select(
+        Votes.id.label('id'),
+        Votes.voter_id.label('voter_id'),
+        Voter.user_id.label('user_id'),
+        User.userid.label('userid'),
+        User.ethereum_address.label('voter_ethereum_address'),
+        Votes.candidate_id.label('candidate_id'),
+        CandidateDetails.name.label('candidate_name'),
+        Votes.transaction_hash.label('transaction_hash'),
+        Votes.block_number.label('block_number'),
+        Votes.voted_at_on_chain.label('voted_at_on_chain'),
+        Votes.created_at.label('created_at'),
+    ).select_from(Votes) \
+        .outerjoin(Voter, Votes.voter_id == Voter.id) \
+        .outerjoin(User, Voter.user_id == User.id) \
+        .outerjoin(CandidateDetails, Votes.candidate_id == CandidateDetails.id) \
+        .order_by(Votes.id)
+
+
+def _voters_query(filters):
+    query = select(
+        Voter.id.label('id'),
+        Voter.user_id.label('user_id'),
+        User.userid.label('userid'),
+        User.ethereum_address.label('ethereum_address'),
+        Voter.is_registered_on_chain.label('is_registered_on_chain'),
+        Voter.chain_registration_tx_hash.label('chain_registration_tx_hash'),
+        Voter.registered_on_chain_at.label('registered_on_chain_at'),
+        Voter.created_at.label('created_at'),
+        Voter.updated_at.label('updated_at'),
+    ).select_from(Voter).outerjoin(User, Voter.user_id == User.id)
+    if filters.get('registered_on_chain') is not None:
+        query = query.where(Voter.is_registered_on_chain == filters['registered_on_chain'])
+    return query.order_by(Voter.id)
+
+
+def _voter_applications_query(filters):
+    applicant = aliased(User)
+    reviewer = aliased(User)
+    query = select(
+        VoterApplication.id.label('id'),
+        VoterApplication.user_id.label('user_id'),
+        applicant.userid.label('user_userid'),
+        applicant.ethereum_address.label('user_ethereum_address'),
+        VoterApplication.status.label('status'),
+        VoterApplication.submitted_at.label('submitted_at'),
+        VoterApplication.reviewed_by_admin_id.label('reviewed_by_admin_id'),
+        reviewer.userid.label('reviewed_by_admin_userid'),
+        VoterApplication.reviewed_at.label('reviewed_at'),
+    ).select_from(VoterApplication) \
+        .outerjoin(applicant, VoterApplication.user_id == applicant.id) \
+        .outerjoin(reviewer, VoterApplication.reviewed_by_admin_id == reviewer.id)
+    if filters.get('status') and filters['status'] != 'all':
+        query = query.where(VoterApplication.status == filters['status'])
+    return query.order_by(VoterApplication.id)
+
+
+# 可导出的表 -> 构造单条 JOIN 查询的函数 (列名与对应模型 to_dict() 的键一致)
+EXPORT_QUERIES = {
+    'votes': _votes_query,
+    'voters': _voters_query,
+    'voter_applications': _voter_applications_query,
+}
+
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def stream_export(table, export_format, filters=None, yield_per=1000):
+    """逐批生成导出内容：使用服务端游标 (yield_per) 读取行，内存占用与总行数无关
+
+    每个批次编码为一个字符串块后立即 yield，表头在查询开始前就发出，客户端可以马上开始接收。
+    """
+    query = EXPORT_QUERIES[table](filters or {}).execution_options(yield_per=yield_per)
+    column_names = [column.name for column in query.selected_columns]
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if export_format == 'csv' else None
+    if writer:
+        writer.writerow(column_names)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    result = db.session.execute(query)
+    try:
+        for rows in result.partitions():
+            for row in rows:
+                if writer:
+                    writer.writerow([_csv_value(value) for value in row])
+                else:
+                    buffer.write(json.dumps({name: _json_value(value) for name, value in zip(column_names, row)},
+                                            ensure_ascii=False))
+                    buffer.write('\n')
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    finally:
+        result.close()
@@ -0,0 +1,146 @@
+# app/utils/gas_policy.py
+import threading
+import time
+
+from web3 import Web3
+
+
+def _argument_shape(value):
+    """参数的"形状"：数组按长度、字符串/字节按 32 字节存储槽数量区分，其它类型只看类型名"""
+    if isinstance(value, (list, tuple)):
+        return ('array', len(value))
+    if isinstance(value, str) and not Web3.is_address(value):
+        return ('bytes32s', (len(value.encode('utf-8')) + 31) // 32)
+    if isinstance(value, (bytes, bytearray)):
+        return ('bytes32s', (len(value) + 31) // 32)
+    return type(value).__name__
+
+
+class GasPolicy:
+    """合约交易的 gas 上限与手续费参数
+
+    gas 上限 = estimate_gas 的结果乘以安全系数再加上固定余量，覆盖首次写入存储槽等按调用者不同而变化的开销。
+    只有 cached_functions 中的高频函数 (投票) 按 (函数名, 参数形状) 缓存预估值 (保留观察到的最大值)；
+    其它函数 (设置周期、开始/结束投票、延长截止时间、注册选民等管理员操作) 每次都向节点预估，
+    预估同时起到预执行的作用：合约状态不允许时在发送前抛出带 revert 原因的 ContractLogicError，
+    而不是发送一笔注定失败的交易。
+    fee_strategy 为 'cached' 时由本地补全手续费字段 (每个区块只查询一次)；为 'node' 时不填写，
+    由节点在 eth_sendTransaction 时自行计算 (使用节点托管账户时这样不产生额外的 RPC)。
+    调用方已经在 tx_params 中给出的 gas/手续费字段不会被覆盖。
+    """
+
+    def __init__(self, w3, multiplier=1.2, padding=25000, estimate_ttl=3600, fee_refresh_interval=1.0,
+                 cached_functions=('vote',), fee_strategy='node',
+                 default_priority_fee=Web3.to_wei(1, 'gwei')):
+        self.w3 = w3
+        self.fee_strategy = fee_strategy
+        self.cached_functions = set(cached_functions)
+        self.multiplier = multiplier
+        self.padding = padding
+        self.estimate_ttl = estimate_ttl
+        self.fee_refresh_interval = fee_refresh_interval
+        self.default_priority_fee = default_priority_fee
+        self._lock = threading.Lock()
+        self._estimates = {}  # (函数名, 参数形状) -> (过期时间, 最大 estimate)
+        self._fees = None  # (区块号, 手续费字段)
+        self._fees_checked_at = 0.0
+        self._stats = {'estimate_hits': 0, 'estimate_misses': 0, 'fee_hits': 0, 'fee_refreshes': 0}
+
+    @staticmethod
+    def _cache_key(contract_function):
+        return contract_function.fn_name, tuple(_argument_shape(arg) for arg in contract_function.args)
+
+    def gas_limit(self, contract_function, tx_params):
+        if contract_function.fn_name not in self.cached_functions:
+            with self._lock:
+                self._stats['estimate_misses'] += 1
+            return int(contract_function.estimate_gas({'from': tx_params['from']}) * self.multiplier) + self.padding
+
+        key = self._cache_key(contract_function)
+        now = time.monotonic()
+        with self._lock:
+            item = self._estimates.get(key)
+            if item and item[0] >= now:
+                self._stats['estimate_hits'] += 1
+                return int(item[1] * self.multiplier) + self.padding
+
+        # 未命中时向节点预估；合约会 revert 的调用在这里直接抛出 ContractLogicError
+        estimate = contract_function.estimate_gas({'from': tx_params['from']})
+        with self._lock:
+            self._stats['estimate_misses'] += 1
+            item = self._estimates.get(key)
+            if item and item[0] >= now:
+                estimate = max(estimate, item[1])
+            self._estimates[key] = (now + self.estimate_ttl, estimate)
+        return int(estimate * self.multiplier) + self.padding
+
+    def fee_params(self):
+        """当前区块的手续费字段: EIP-1559 链返回 maxFeePerGas/maxPriorityFeePerGas，否则返回 gasPrice"""
+        with self._lock:
+            if self._fees and time.monotonic() - self._fees_checked_at < self.fee_refresh_interval:
+                self._stats['fee_hits'] += 1
+                return dict(self._fees[1])
+
+        block = self.w3.eth.get_block('latest')
+        with self._lock:
+            self._fees_checked_at = time.monotonic()
+            if self._fees and self._fees[0] == block['number']:
+                self._stats['fee_hits'] += 1
+                return dict(self._fees[1])
+
+        base_fee = block.get('baseFeePerGas')
+        if base_fee is None:
+            fees = {'gasPrice': self.w3.eth.gas_price}
+        else:
+            try:
+                priority_fee = self.w3.eth.max_priority_fee
+            except Exception:
+                priority_fee = self.default_priority_fee
+            # 与 web3 默认策略一致: 2 倍基础费用可以承受连续多个满区块的上涨
+            fees = {'maxFeePerGas': 2 * base_fee + priority_fee, 'maxPriorityFeePerGas': priority_fee}
+        with self._lock:
+            self._fees = (block['number'], fees)
+            self._stats['fee_refreshes'] += 1
+        return dict(fees)
+
+    def apply(self, contract_function, tx_params):
+        """返回补全 gas 与手续费字段后的交易参数"""
+        params = dict(tx_params)
+        if 'gas' not in params:
+            params['gas'] = self.gas_limit(contract_function, params)
+        if self.fee_strategy == 'cached' and \
+                not any(field in params for field in ('gasPrice', 'maxFeePerGas', 'maxPriorityFeePerGas')):
+            params.update(self.fee_params())
+        return params
+
+    def invalidate(self):
+        with self._lock:
+            self._estimates.clear()
+            self._fees = None
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self._stats, cached_estimates=len(self._estimates))
+
+
+gas_policy = None
+
+
+def init_gas_policy(w3, app):
+    global gas_policy
+    gas_policy = GasPolicy(
+        w3,
+        multiplier=app.config.get('GAS_ESTIMATE_MULTIPLIER', 1.2),
+        padding=app.config.get('GAS_ESTIMATE_PADDING', 25000),
+        estimate_ttl=app.config.get('GAS_ESTIMATE_TTL_SECONDS', 3600),
+        fee_refresh_interval=app.config.get('GAS_FEE_REFRESH_SECONDS', 1.0),
+        cached_functions=app.config.get('GAS_ESTIMATE_CACHED_FUNCTIONS', ('vote',)),
+        fee_strategy=app.config.get('GAS_FEE_STRATEGY', 'node')
+    )
+    return gas_policy
+
+
+def get_gas_policy():
+    if not gas_policy:
+        raise RuntimeError("Gas policy not initialized. Call init_web3 first within app context.")
+    return gas_policy
@@ -0,0 +1,135 @@
+# app/utils/image_store.py
+import hashlib
+import io
+import mimetypes
+import os
+import re
+import tempfile
+
+from flask import Response, current_app, request, send_from_directory
+
+# 上传格式 (Pillow 识别结果) -> 原图扩展名
+ALLOWED_FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+VARIANT_EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg', 'PNG': 'png'}
+
+# 内容寻址的文件名: <sha256>.<ext> (原图) 或 <sha256>_<尺寸名>.<ext>
+CONTENT_ADDRESSED_RE = re.compile(r'^(?P<digest>[0-9a-f]{64})(?:_(?P<variant>[a-z]+))?\.(?P<ext>[a-z]+)$')
+
+
+class CandidateImageStore:
+    """候选人图片的内容寻址存储
+
+    文件以原始内容的 SHA-256 命名，同一张图片重复上传只保存一份；上传时一次性生成各个尺寸，
+    之后的请求只是读取静态文件。文件名确定后内容不再变化，因此可以返回 immutable 缓存头，
+    并可交给 nginx (X-Accel-Redirect) 或 Apache/lighttpd (X-Sendfile) 直接发送。
+    """
+
+    def __init__(self, directory=None, sizes=None, variant_format='WEBP', quality=85, max_bytes=10 * 1024 * 1024):
+        self.directory = directory
+        self.sizes = sizes or {'thumb': 160, 'display': 640}
+        self.variant_format = variant_format
+        self.quality = quality
+        self.max_bytes = max_bytes
+
+    def _filename(self, digest, ext, variant=None):
+        return f"{digest}_{variant}.{ext}" if variant else f"{digest}.{ext}"
+
+    def _write_atomic(self, filename, data):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                tmp_file.write(data)
+            os.replace(tmp_path, os.path.join(self.directory, filename))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _render_variant(self, image, max_side):
+        from PIL import Image
+
+        variant = image.copy()
+        variant.thumbnail((max_side, max_side), Image.LANCZOS)
+        if self.variant_format == 'JPEG' and variant.mode not in ('RGB', 'L'):
+            variant = variant.convert('RGB')
+        elif variant.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+            variant = variant.convert('RGBA')
+        buffer = io.BytesIO()
+        variant.save(buffer, format=self.variant_format, quality=self.quality, optimize=True)
+        return buffer.getvalue()
+
+    def save(self, file_storage):
+        """保存上传的图片并生成各尺寸版本，返回 (digest, {尺寸名: 文件名}, 是否为重复上传)
+
+        不是受支持的图片格式或超过大小上限时抛出 ValueError。
+        """
+        try:
+            from PIL import Image, ImageOps, UnidentifiedImageError
+        except ImportError as e:
+            raise RuntimeError("Candidate image uploads require the 'Pillow' package.") from e
+
+        data = file_storage.read(self.max_bytes + 1)
+        if len(data) > self.max_bytes:
+            raise ValueError(f"Image exceeds the {self.max_bytes // (1024 * 1024)} MB limit.")
+        try:
+            image = Image.open(io.BytesIO(data))
+            image_format = image.format
+            image.load()
+        except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+            raise ValueError("Uploaded file is not a valid image.") from e
+        if image_format not in ALLOWED_FORMATS:
+            raise ValueError(f"Unsupported image format: {image_format}.")
+
+        digest = hashlib.sha256(data).hexdigest()
+        variant_ext = VARIANT_EXTENSIONS[self.variant_format]
+        filenames = {'original': self._filename(digest, ALLOWED_FORMATS[image_format])}
+        filenames.update({name: self._filename(digest, variant_ext, name) for name in self.sizes})
+
+        os.makedirs(self.directory, exist_ok=True)
+        if all(os.path.exists(os.path.join(self.directory, filename)) for filename in filenames.values()):
+            return digest, filenames, True
+
+        # 按 EXIF 方向旋转后再缩放，避免手机照片显示为横向
+        image = ImageOps.exif_transpose(image)
+        for name, max_side in self.sizes.items():
+            self._write_atomic(filenames[name], self._render_variant(image, max_side))
+        self._write_atomic(filenames['original'], data)
+        return digest, filenames, False
+
+    def send(self, filename):
+        """返回图片响应：内容寻址的文件带 immutable 缓存头与 ETag，按配置交给前端服务器发送"""
+        content_addressed = CONTENT_ADDRESSED_RE.match(filename)
+        offload = current_app.config.get('CANDIDATE_IMAGE_OFFLOAD')
+        if offload and os.path.isfile(os.path.join(self.directory, filename)):
+            response = Response(mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+            if offload == 'x-accel-redirect':
+                prefix = current_app.config.get('CANDIDATE_IMAGE_X_ACCEL_PREFIX', '/protected/candidates')
+                response.headers['X-Accel-Redirect'] = f"{prefix.rstrip('/')}/{filename}"
+            else:
+                response.headers['X-Sendfile'] = os.path.abspath(os.path.join(self.directory, filename))
+        else:
+            # 不存在时抛出 NotFound (404)
+            response = send_from_directory(self.directory, filename)
+
+        if content_addressed:
+            response.set_etag(os.path.splitext(filename)[0])
+            response.headers['Cache-Control'] = \
+                f"public, max-age={current_app.config.get('CANDIDATE_IMAGE_MAX_AGE_SECONDS', 31536000)}, immutable"
+            return response.make_conditional(request)
+        return response
+
+
+image_store = CandidateImageStore()
+
+
+def init_image_store(app):
+    image_store.directory = app.config.get('CANDIDATE_IMAGE_DIRECTORY') or \
+        os.path.join(app.root_path, 'uploads', 'candidates')
+    image_store.sizes = app.config.get('CANDIDATE_IMAGE_SIZES', {'thumb': 160, 'display': 640})
+    image_store.variant_format = app.config.get('CANDIDATE_IMAGE_VARIANT_FORMAT', 'WEBP')
+    image_store.quality = app.config.get('CANDIDATE_IMAGE_QUALITY', 85)
+    image_store.max_bytes = app.config.get('CANDIDATE_IMAGE_MAX_BYTES', 10 * 1024 * 1024)
+
+
+def get_image_store():
+    return image_store
@@ -0,0 +1,190 @@
+# app/utils/metrics.py
+import bisect
+import threading
+import time
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+from web3.middleware import Web3Middleware
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """按标签分组的 Prometheus 直方图 (累计桶 + _sum + _count)"""
+
+    def __init__(self, name, documentation, label_names, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._series = {}  # 标签值元组 -> [各桶计数..., +Inf 计数, sum]
+
+    def observe(self, labels, value):
+        bucket_index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bucket_index] += 1
+            series[-1] += value
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series_items = sorted((labels, list(series)) for labels, series in self._series.items())
+        for labels, series in series_items:
+            label_text = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, labels))
+            cumulative = 0
+            for upper_bound, count in zip(self.buckets + ('+Inf',), series[:-1]):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label_text},le="{upper_bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {series[-1]}")
+            lines.append(f"{self.name}_count{{{label_text}}} {cumulative}")
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class RequestMetrics:
+    """HTTP 请求、web3 RPC 调用与 SQL 语句的耗时统计
+
+    每次 RPC/SQL 调用都按所属的 Flask 接口 (request.endpoint) 记入直方图，
+    并在请求内累计，用于生成 Server-Timing 响应头。指标保存在进程内，多 worker 部署时由 Prometheus 分别抓取。
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.server_timing = False
+        self.http_duration = None
+        self.rpc_duration = None
+        self.sql_duration = None
+
+    def configure(self, buckets=DEFAULT_BUCKETS):
+        self.http_duration = Histogram('voting_http_request_duration_seconds', 'HTTP request latency.',
+                                       ('endpoint', 'method', 'status'), buckets)
+        self.rpc_duration = Histogram('voting_rpc_request_duration_seconds', 'Web3 JSON-RPC call latency.',
+                                      ('endpoint', 'rpc_method'), buckets)
+        self.sql_duration = Histogram('voting_sql_query_duration_seconds', 'SQL statement latency.',
+                                      ('endpoint', 'operation'), buckets)
+
+    @staticmethod
+    def current_endpoint():
+        if has_request_context():
+            return request.endpoint or 'unknown'
+        return 'background'
+
+    @staticmethod
+    def _add_request_timing(name, seconds):
+        if not has_request_context():
+            return
+        timings = g.setdefault('request_timings', {})
+        count, total = timings.get(name, (0, 0.0))
+        timings[name] = (count + 1, total + seconds)
+
+    def observe_rpc(self, rpc_method, seconds):
+        if not self.enabled:
+            return
+        self.rpc_duration.observe((self.current_endpoint(), rpc_method), seconds)
+        self._add_request_timing('rpc', seconds)
+
+    def observe_sql(self, statement, seconds):
+        if not self.enabled:
+            return
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'UNKNOWN'
+        self.sql_duration.observe((self.current_endpoint(), operation), seconds)
+        self._add_request_timing('sql', seconds)
+
+    def before_request(self):
+        g.request_started_at = time.perf_counter()
+
+    def after_request(self, response):
+        started_at = g.get('request_started_at')
+        if started_at is None:
+            return response
+        elapsed = time.perf_counter() - started_at
+        self.http_duration.observe((request.endpoint or 'unknown', request.method, str(response.status_code)),
+                                   elapsed)
+
+        if self.server_timing:
+            parts = [f'{name};dur={total * 1000:.2f};desc="{count} calls"'
+                     for name, (count, total) in sorted(g.get('request_timings', {}).items())]
+            parts.append(f'app;dur={elapsed * 1000:.2f}')
+            response.headers.add('Server-Timing', ', '.join(parts))
+        return response
+
+    def expose(self):
+        lines = []
+        for histogram in (self.http_duration, self.rpc_duration, self.sql_duration):
+            lines.extend(histogram.expose())
+        return '\n'.join(lines) + '\n'
+
+
+request_metrics = RequestMetrics()
+
+
+class RpcTimingMiddleware(Web3Middleware):
+    """记录每次 web3 请求的耗时；批量请求按一次往返记录，方法名为 batch"""
+
+    def wrap_make_request(self, make_request):
+        def middleware(method, params):
+            started = time.perf_counter()
+            try:
+                return make_request(method, params)
+            finally:
+                request_metrics.observe_rpc(method, time.perf_counter() - started)
+
+        return middleware
+
+    def wrap_make_batch_request(self, make_batch_request):
+        def middleware(requests_info):
+            started = time.perf_counter()
+            try:
+                return make_batch_request(requests_info)
+            finally:
+                request_metrics.observe_rpc('batch', time.perf_counter() - started)
+
+        return middleware
+
+
+def instrument_web3(w3):
+    w3.middleware_onion.add(RpcTimingMiddleware, 'rpc_timing')
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started_at', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started_queries = conn.info.get('query_started_at')
+    if not started_queries:
+        return
+    started_at = started_queries.pop()
+    request_metrics.observe_sql(statement, time.perf_counter() - started_at)
+
+
+def instrument_engine(engine):
+    if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+def init_metrics(app, db):
+    request_metrics.enabled = app.config.get('METRICS_ENABLED', True)
+    request_metrics.server_timing = app.config.get('SERVER_TIMING_ENABLED', True)
+    if not request_metrics.enabled:
+        return
+    if request_metrics.http_duration is None:
+        request_metrics.configure(app.config.get('METRICS_HISTOGRAM_BUCKETS', DEFAULT_BUCKETS))
+
+    with app.app_context():
+        instrument_engine(db.engine)
+    app.before_request(request_metrics.before_request)
+    app.after_request(request_metrics.after_request)
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        return Response(request_metrics.expose(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,151 @@
+# app/utils/nonce_manager.py
+import threading
+from contextlib import contextmanager
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+from web3 import Web3
+
+# 节点返回这些错误时说明本地 nonce 与链上不一致，需要重新同步
+NONCE_ERROR_MARKERS = ('nonce too low', 'nonce too high', 'already known', 'replacement transaction underpriced',
+                       'incorrect nonce', 'invalid transaction nonce', "the tx doesn't have the correct nonce")
+
+
+def _is_nonce_error(error):
+    return any(marker in str(error).lower() for marker in NONCE_ERROR_MARKERS)
+
+
+class DatabaseNonceCoordinator:
+    """用数据库行锁在多个服务进程之间串行化同一账户的"分配 nonce + 发送"，下一个 nonce 保存在该行中
+
+    所有 gunicorn worker 都用同一个管理员账户发送交易，只在进程内计数会分配出重复的 nonce。
+    行锁使用独立的连接与事务，不会提交或回滚调用方会话中尚未提交的修改。
+    """
+
+    @contextmanager
+    def hold(self, address):
+        """锁定账户行，产出 {'next_nonce': 下一个 nonce 或 None (需要按链上计数同步)}，正常退出时写回"""
+        from app import db
+        from ..models.models import AccountNonce
+        table = AccountNonce.__table__
+        # 先执行一条不改变数据的 UPDATE 获取行锁 (MySQL 的行锁与 SQLite 的写锁都由它取得，SQLite 会忽略 FOR UPDATE)
+        lock_row = update(table).where(table.c.address == address).values(next_nonce=table.c.next_nonce)
+        read_row = select(table.c.next_nonce).where(table.c.address == address)
+
+        with db.engine.connect() as conn:
+            with conn.begin():
+                conn.execute(lock_row)
+                row = conn.execute(read_row).first()
+                if row is None:
+                    try:
+                        with conn.begin_nested():
+                            conn.execute(insert(table).values(address=address, next_nonce=None))
+                    except IntegrityError:
+                        # 其它进程同时创建了该行
+                        pass
+                    conn.execute(lock_row)
+                    row = conn.execute(read_row).one()
+                state = {'next_nonce': row.next_nonce}
+                yield state
+                conn.execute(update(table).where(table.c.address == address)
+                             .values(next_nonce=state['next_nonce']))
+
+
+class NonceManager:
+    """为发送交易的账户在本地分配 nonce，允许多个交易并发发送而不必等待前一笔上链
+
+    首次使用或出错后，用 eth_getTransactionCount(address, 'pending') 重新同步；
+    发送失败 (交易未进入交易池) 的 nonce 会造成空洞，此时同样重新同步以回收空洞。
+    同一账户的"分配 + 发送"在账户锁内完成，保证交易按 nonce 顺序到达节点，
+    但不会等待回执，因此多笔交易可以同时处于待打包状态。
+    配置了 gas_policy 时，gas 上限与手续费在获取账户锁之前补全，预估请求不会阻塞其它交易的发送。
+    配置了 coordinator 时 (多进程部署)，nonce 由数据库行分配，账户锁之外再持有该行的行锁。
+    """
+
+    def __init__(self, w3, gas_policy=None, coordinator=None):
+        self.w3 = w3
+        self.gas_policy = gas_policy
+        self.coordinator = coordinator
+        self._lock = threading.Lock()
+        self._next_nonce = {}  # address -> 下一个可用 nonce
+        self._send_locks = {}  # address -> 发送锁
+
+    def _send_lock(self, address):
+        with self._lock:
+            return self._send_locks.setdefault(address, threading.Lock())
+
+    def resync(self, address):
+        address = Web3.to_checksum_address(address)
+        with self._lock:
+            self._next_nonce[address] = self.w3.eth.get_transaction_count(address, 'pending')
+            return self._next_nonce[address]
+
+    def allocate(self, address):
+        address = Web3.to_checksum_address(address)
+        with self._lock:
+            if address not in self._next_nonce:
+                self._next_nonce[address] = self.w3.eth.get_transaction_count(address, 'pending')
+            nonce = self._next_nonce[address]
+            self._next_nonce[address] = nonce + 1
+            return nonce
+
+    def release(self, address, nonce):
+        """分配的 nonce 未被使用 (交易发送失败)，回收它以避免后续交易卡在空洞之后"""
+        address = Web3.to_checksum_address(address)
+        with self._lock:
+            if self._next_nonce.get(address) == nonce + 1:
+                # 最近分配的 nonce，直接回退
+                self._next_nonce[address] = nonce
+            else:
+                # 之后已有其它 nonce 被分配，以节点的 pending 计数为准重新同步
+                self._next_nonce.pop(address, None)
+
+    def transact(self, contract_function, tx_params):
+        """使用本地分配的 nonce 发送合约交易；nonce 冲突时重新同步并重试一次"""
+        sender = Web3.to_checksum_address(tx_params['from'])
+        if self.gas_policy:
+            tx_params = self.gas_policy.apply(contract_function, tx_params)
+        with self._send_lock(sender):
+            if self.coordinator is not None:
+                return self._transact_coordinated(sender, contract_function, tx_params)
+            for attempt in range(2):
+                nonce = self.allocate(sender)
+                try:
+                    return contract_function.transact({**tx_params, 'nonce': nonce})
+                except Exception as e:
+                    self.release(sender, nonce)
+                    if attempt == 0 and _is_nonce_error(e):
+                        self.resync(sender)
+                        continue
+                    raise
+
+    def _transact_coordinated(self, sender, contract_function, tx_params):
+        with self.coordinator.hold(sender) as state:
+            for attempt in range(2):
+                nonce = state['next_nonce']
+                if nonce is None:
+                    nonce = self.w3.eth.get_transaction_count(sender, 'pending')
+                try:
+                    tx_hash = contract_function.transact({**tx_params, 'nonce': nonce})
+                except Exception as e:
+                    # 各进程的发送已由行锁串行化，冲突只可能来自绕过本服务的交易，按链上计数同步一次即可
+                    if attempt == 0 and _is_nonce_error(e):
+                        state['next_nonce'] = None
+                        continue
+                    raise
+                state['next_nonce'] = nonce + 1
+                return tx_hash
+
+
+nonce_manager = None
+
+
+def init_nonce_manager(w3, gas_policy=None, coordinator=None):
+    global nonce_manager
+    nonce_manager = NonceManager(w3, gas_policy=gas_policy, coordinator=coordinator)
+
+
+def get_nonce_manager():
+    if not nonce_manager:
+        raise RuntimeError("Nonce manager not initialized. Call init_web3 first within app context.")
+    return nonce_manager
@@ -0,0 +1,52 @@
+# app/utils/pagination.py
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(values):
+    """把排序键的值编码为不透明的游标字符串"""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor, columns):
+    """解析游标字符串，按列类型还原排序键的值；格式错误时抛出 ValueError"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if not isinstance(payload, list) or len(payload) != len(columns):
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+    values = []
+    for column, value in zip(columns, payload):
+        if value is not None and column.type.python_type is datetime:
+            value = datetime.fromisoformat(value)
+        values.append(value)
+    return values
+
+
+def keyset_paginate(query, columns, cursor=None, limit=10):
+    """基于 (col1, col2, ...) 降序排序的游标分页，深页查询和首页一样走索引范围扫描
+
+    返回 (items, next_cursor)，没有更多数据时 next_cursor 为 None。
+    """
+    if cursor:
+        values = decode_cursor(cursor, columns)
+        # (c1, c2) < (v1, v2) 展开为 c1 < v1 OR (c1 = v1 AND c2 < v2)
+        conditions = []
+        for i, column in enumerate(columns):
+            equal_prefix = [columns[j] == values[j] for j in range(i)]
+            conditions.append(and_(*equal_prefix, column < values[i]))
+        query = query.filter(or_(*conditions))
+
+    rows = query.order_by(*[column.desc() for column in columns]).limit(limit + 1).all()
+    items = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        next_cursor = encode_cursor([getattr(last, column.key) for column in columns])
+    return items, next_cursor
@@ -0,0 +1,182 @@
+# app/utils/password_hasher.py
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class PasswordHasherBusy(RuntimeError):
+    """哈希进程池排队已满或等待超时，调用方应返回 503 让客户端稍后重试"""
+
+
+def _hash_password(password, method):
+    return generate_password_hash(password, method=method)
+
+
+# 工作进程内按方法缓存的规范化哈希参数前缀 (例如 'scrypt:32768:8:1')
+_prefixes = {}
+
+
+def _current_prefix(method):
+    """需要用同样的参数计算一次哈希才能得到，在工作进程中首次校验时计算，不占用请求线程"""
+    prefix = _prefixes.get(method)
+    if prefix is None:
+        prefix = _prefixes[method] = generate_password_hash('', method=method).split('$', 1)[0]
+    return prefix
+
+
+def _verify_password(pwhash, password, method):
+    """在工作进程中校验密码；哈希参数与当前配置不一致时顺便生成新哈希，返回 (是否匹配, 新哈希或 None)"""
+    if not check_password_hash(pwhash, password):
+        return False, None
+    if pwhash.split('$', 1)[0] != _current_prefix(method):
+        return True, generate_password_hash(password, method=method)
+    return True, None
+
+
+class PasswordHashingService:
+    """在有界的进程池中执行 scrypt/PBKDF2 哈希，避免 CPU 密集的计算占满 Flask 工作线程并争用 GIL
+
+    排队 (含执行中) 的任务超过 max_pending 时立即拒绝，而不是让请求无限堆积；
+    workers 为 0 时在当前线程同步计算 (脚本与调试使用)。进程池在首次使用时创建，每个服务进程各自一个。
+    服务进程中已有 APScheduler、Web3 预热等线程，fork 会把它们持有的锁原样复制到子进程，
+    因此默认用 forkserver 启动工作进程 (不支持的平台退回 spawn)。
+    """
+
+    def __init__(self, workers=None, max_pending=64, method='scrypt', timeout=10.0, start_method='forkserver'):
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.start_method = start_method
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pending = 0
+        self._stats = {'hashed': 0, 'verified': 0, 'rehashed': 0, 'shed': 0}
+        self.method = method
+
+    def configure(self, method):
+        self.method = method
+
+    def _get_executor(self):
+        if self._executor is None:
+            context = None
+            if self.start_method:
+                start_method = self.start_method
+                if start_method not in multiprocessing.get_all_start_methods():
+                    start_method = 'spawn'
+                context = multiprocessing.get_context(start_method)
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        return self._executor
+
+    def _discard_executor(self, executor):
+        """工作进程异常退出后进程池不可再用，丢弃它，下一次提交时重建 (调用方持有 _lock)"""
+        if self._executor is executor:
+            self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, fn, *args):
+        executor = self._get_executor()
+        try:
+            return executor.submit(fn, *args), executor
+        except BrokenProcessPool:
+            # 重建一次；再次失败时异常交给调用方
+            self._discard_executor(executor)
+            executor = self._get_executor()
+            return executor.submit(fn, *args), executor
+
+    def _run(self, fn, *args):
+        if self.workers <= 0:
+            return fn(*args)
+
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._stats['shed'] += 1
+                raise PasswordHasherBusy(f"Password hashing queue is full ({self.max_pending} pending).")
+            self._pending += 1
+            try:
+                future, executor = self._submit(fn, *args)
+            except Exception:
+                self._pending -= 1
+                raise
+        future.add_done_callback(self._task_done)
+
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError as e:
+            future.cancel()
+            with self._lock:
+                self._stats['shed'] += 1
+            raise PasswordHasherBusy(f"Password hashing did not finish within {self.timeout}s.") from e
+        except BrokenProcessPool as e:
+            # 任务执行期间工作进程被杀死 (例如内存不足)，重建进程池，本次请求让客户端稍后重试
+            with self._lock:
+                self._discard_executor(executor)
+                self._stats['shed'] += 1
+            raise PasswordHasherBusy("Password hashing worker exited unexpectedly.") from e
+
+    def _task_done(self, future):
+        with self._lock:
+            self._pending -= 1
+
+    def hash_password(self, password):
+        password_hash = self._run(_hash_password, password, self.method)
+        with self._lock:
+            self._stats['hashed'] += 1
+        return password_hash
+
+    def verify_password(self, pwhash, password):
+        """返回 (是否匹配, 新哈希)；新哈希不为 None 时调用方应保存它 (登录时透明升级哈希参数)"""
+        matched, new_hash = self._run(_verify_password, pwhash, password, self.method)
+        with self._lock:
+            self._stats['verified'] += 1
+            if new_hash:
+                self._stats['rehashed'] += 1
+        return matched, new_hash
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self._stats, workers=self.workers, pending=self._pending, max_pending=self.max_pending)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+password_hasher = None
+
+
+def init_password_hasher(app):
+    global password_hasher
+    workers = app.config.get('PASSWORD_HASH_POOL_WORKERS')
+    if workers is None:
+        workers = os.cpu_count() or 1
+    max_pending = app.config.get('PASSWORD_HASH_MAX_PENDING') or max(workers, 1) * 8
+    method = app.config.get('PASSWORD_HASH_METHOD', 'scrypt')
+    timeout = app.config.get('PASSWORD_HASH_TIMEOUT_SECONDS', 10.0)
+
+    if password_hasher is not None:
+        # create_app 可能在同一进程中被多次调用 (例如调度任务)，沿用已有的进程池，只更新参数
+        password_hasher.max_pending = max_pending
+        password_hasher.timeout = timeout
+        password_hasher.configure(method)
+        return password_hasher
+
+    password_hasher = PasswordHashingService(
+        workers=workers,
+        max_pending=max_pending,
+        method=method,
+        timeout=timeout,
+        start_method=app.config.get('PASSWORD_HASH_POOL_START_METHOD', 'forkserver')
+    )
+    return password_hasher
+
+
+def get_password_hasher():
+    if not password_hasher:
+        raise RuntimeError("Password hasher not initialized. Call init_password_hasher first.")
+    return password_hasher
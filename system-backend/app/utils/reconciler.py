@@ -0,0 +1,250 @@
+# app/utils/reconciler.py
+import json
+import time
+from datetime import datetime, UTC
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from web3 import Web3
+
+from .. import db
+from ..models.models import CandidateDetails, IndexerCursor, PendingVote, ReconciliationReport, User, Voter, Votes
+from .chain_indexer import VOTER_REGISTERED_TOPIC
+from .response_cache import response_cache
+from .tally_cache import VOTED_TOPIC, VOTE_REVOKED_TOPIC
+from .web3_utils import batch_call, get_contract, get_w3
+
+RECONCILED_TOPICS = [VOTER_REGISTERED_TOPIC, VOTED_TOPIC, VOTE_REVOKED_TOPIC]
+
+
+class ChainStateReconciler:
+    """对比合约中的选民状态 (getVoterInfo) 与数据库的 voters/votes 记录，修复不一致
+
+    只检查检查点区块之后有 VoterRegistered/Voted/VoteRevoked 事件的地址，
+    每次运行的开销与新增事件数量相关，与选民总数无关。
+    最近 grace_seconds 内的区块暂不处理，避免与仍在写库的 cast_vote/revoke_vote 请求冲突。
+    """
+
+    def __init__(self, name='reconciler', block_range=5000, batch_size=500, grace_seconds=120):
+        self.name = name
+        self.block_range = block_range
+        self.batch_size = batch_size
+        self.grace_seconds = grace_seconds
+
+    def _get_cursor(self):
+        cursor = IndexerCursor.query.filter_by(name=self.name).first()
+        if not cursor:
+            cursor = IndexerCursor(name=self.name, last_block=-1)
+            db.session.add(cursor)
+            db.session.commit()
+        return cursor
+
+    def _target_block(self, w3, from_block):
+        """时间戳不晚于 now - grace_seconds 的最高区块 (二分查找，只需 O(log n) 次 RPC)"""
+        cutoff = time.time() - self.grace_seconds
+        low, high = from_block, w3.eth.block_number
+        if high < low or w3.eth.get_block(low)['timestamp'] > cutoff:
+            return low - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if w3.eth.get_block(middle)['timestamp'] <= cutoff:
+                low = middle
+            else:
+                high = middle - 1
+        return low
+
+    def _changed_addresses(self, w3, contract, from_block, to_block):
+        """返回 {地址: 最后一次 Voted 事件的 (tx_hash, block_number) 或 None}"""
+        changed = {}
+        handlers = {
+            VOTER_REGISTERED_TOPIC: contract.events.VoterRegistered,
+            VOTED_TOPIC: contract.events.Voted,
+            VOTE_REVOKED_TOPIC: contract.events.VoteRevoked,
+        }
+        logs = w3.eth.get_logs({
+            'address': contract.address,
+            'fromBlock': from_block,
+            'toBlock': to_block,
+            'topics': [[Web3.to_hex(topic) for topic in RECONCILED_TOPICS]]
+        })
+        for log in logs:
+            topic = log['topics'][0]
+            address = handlers[topic]().process_log(log)['args']['voterAddress']
+            if topic == VOTED_TOPIC:
+                changed[address] = (log['transactionHash'].hex(), log['blockNumber'])
+            else:
+                changed.setdefault(address, None)
+        return changed
+
+    @staticmethod
+    def _resolve_candidates(contract, indexes, cache):
+        """把链上候选人索引映射为 candidate_details.id，结果写入 cache"""
+        missing = [index for index in indexes if index not in cache]
+        if not missing:
+            return
+        names = [name for name, _ in batch_call([contract.functions.getCandidate(index) for index in missing])]
+        ids_by_name = dict(db.session.query(CandidateDetails.name, CandidateDetails.id)
+                           .filter(CandidateDetails.name.in_(names)).all())
+        for index, name in zip(missing, names):
+            cache[index] = ids_by_name.get(name)
+
+    def _reconcile_batch(self, contract, addresses, last_votes, candidate_cache, report):
+        chain_states = batch_call([contract.functions.getVoterInfo(address) for address in addresses])
+
+        rows = db.session.query(User, Voter, Votes) \
+            .outerjoin(Voter, Voter.user_id == User.id) \
+            .outerjoin(Votes, Votes.voter_id == Voter.id) \
+            .filter(User.ethereum_address.in_(addresses)).all()
+        rows_by_address = {user.ethereum_address: (user, voter, vote) for user, voter, vote in rows}
+        voter_ids = [voter.id for _, voter, _ in rows if voter]
+        pending_voter_ids = {
+            row[0] for row in db.session.query(PendingVote.voter_id)
+            .filter(PendingVote.voter_id.in_(voter_ids), PendingVote.status == 'pending').all()
+        } if voter_ids else set()
+        self._resolve_candidates(
+            contract, {voted_for for _, has_voted, voted_for in chain_states if has_voted}, candidate_cache)
+
+        for address, (is_registered, has_voted, voted_for) in zip(addresses, chain_states):
+            if address not in rows_by_address:
+                report['unknown_addresses'] += 1
+                continue
+            user, voter, vote = rows_by_address[address]
+            if voter and voter.id in pending_voter_ids:
+                # 异步投票仍在等待回执，由 vote_pipeline 负责落库
+                report['skipped_pending'] += 1
+                continue
+
+            if is_registered and not voter:
+                voter = Voter(user_id=user.id, is_registered_on_chain=True, registered_on_chain_at=datetime.now(UTC))
+                db.session.add(voter)
+                db.session.flush()
+                self._record_fix(report, 'voter_created', address)
+            elif voter and voter.is_registered_on_chain != is_registered:
+                voter.is_registered_on_chain = is_registered
+                self._record_fix(report, 'registration_fixed', address)
+            if not voter:
+                continue
+
+            candidate_id = candidate_cache.get(voted_for) if has_voted else None
+            if has_voted and candidate_id is None:
+                report['unresolved'] += 1
+                current_app.logger.warning(
+                    f"Reconciler: candidate #{voted_for} voted by {address} has no CandidateDetails row.")
+            elif has_voted and not vote:
+                if not last_votes.get(address):
+                    # 投票发生在检查点之前，无法确定交易哈希
+                    report['unresolved'] += 1
+                    continue
+                tx_hash, block_number = last_votes[address]
+                db.session.add(Votes(voter_id=voter.id, candidate_id=candidate_id, transaction_hash=tx_hash,
+                                     block_number=block_number, voted_at_on_chain=datetime.now(UTC)))
+                self._record_fix(report, 'vote_created', address)
+            elif has_voted and (vote.candidate_id != candidate_id or (
+                    last_votes.get(address) and vote.transaction_hash != last_votes[address][0])):
+                # 分段处理时，候选人可能已在之前没有 Voted 事件的区段中修正，这里补上交易哈希
+                vote.candidate_id = candidate_id
+                if last_votes.get(address):
+                    vote.transaction_hash, vote.block_number = last_votes[address]
+                self._record_fix(report, 'vote_updated', address)
+            elif not has_voted and vote:
+                db.session.delete(vote)
+                self._record_fix(report, 'vote_deleted', address)
+
+    @staticmethod
+    def _record_fix(report, kind, address):
+        report['fixes'][kind] = report['fixes'].get(kind, 0) + 1
+        if len(report['fixed_addresses']) < 100:
+            report['fixed_addresses'].append({'address': address, 'fix': kind})
+
+    def run_once(self):
+        """对账检查点之后变化的地址，返回本次运行的报告"""
+        w3 = get_w3()
+        contract = get_contract()
+        cursor = self._get_cursor()
+        from_block = cursor.last_block + 1
+        to_block = self._target_block(w3, from_block)
+        report = {
+            'started_at': datetime.now(UTC).isoformat(),
+            'from_block': from_block,
+            'to_block': to_block,
+            'checked_addresses': 0,
+            'fixes': {},
+            'fixed_addresses': [],
+            'unknown_addresses': 0,
+            'skipped_pending': 0,
+            'unresolved': 0
+        }
+        if to_block < from_block:
+            return report
+
+        # 与 chain_indexer 相同，按 block_range 分段处理，每段的修复与检查点在同一事务中提交；
+        # 首次运行 (检查点为 -1) 时不会在一个事务中处理整条链
+        candidate_cache = {}
+        range_start = from_block
+        while range_start <= to_block:
+            range_end = min(range_start + self.block_range - 1, to_block)
+            last_votes = self._changed_addresses(w3, contract, range_start, range_end)
+            addresses = list(last_votes)
+            try:
+                for i in range(0, len(addresses), self.batch_size):
+                    self._reconcile_batch(contract, addresses[i:i + self.batch_size], last_votes, candidate_cache,
+                                          report)
+                    report['checked_addresses'] += len(addresses[i:i + self.batch_size])
+                cursor.last_block = range_end
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            range_start = range_end + 1
+
+        if report['fixes']:
+            response_cache.invalidate('candidates')
+            current_app.logger.warning(f"Reconciler '{self.name}' repaired drift in blocks {from_block}-{to_block}: "
+                                       f"{report['fixes']}")
+        current_app.logger.info(
+            f"Reconciler '{self.name}' checked {report['checked_addresses']} addresses in blocks "
+            f"{from_block}-{to_block}.")
+        return report
+
+
+def reconcile_chain_state():
+    reconciler = ChainStateReconciler(
+        block_range=current_app.config.get('EVENT_LOG_BLOCK_RANGE', 5000),
+        batch_size=current_app.config.get('RECONCILER_BATCH_SIZE', 500),
+        grace_seconds=current_app.config.get('RECONCILER_GRACE_SECONDS', 120)
+    )
+    report = reconciler.run_once()
+    save_report(reconciler.name, report)
+    return report
+
+
+def save_report(name, report):
+    """保存最近一次对账结果：定时任务只在主节点进程运行，报告写入数据库供所有进程查询"""
+    row = ReconciliationReport.query.filter_by(name=name).first()
+    if row is None:
+        row = ReconciliationReport(name=name)
+        db.session.add(row)
+    row.report = json.dumps(report)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # 其它进程同时创建了这一行 (手动触发与定时任务并发)，改为更新
+        db.session.rollback()
+        ReconciliationReport.query.filter_by(name=name).update({'report': json.dumps(report)})
+        db.session.commit()
+
+
+def get_last_report(name='reconciler'):
+    row = ReconciliationReport.query.filter_by(name=name).first()
+    return json.loads(row.report) if row else None
+
+
+def job_reconcile_chain_state():
+    """APScheduler 定时任务入口：在调度器绑定的应用上下文中对账"""
+    from app import scheduler
+
+    with scheduler.app.app_context():
+        try:
+            reconcile_chain_state()
+        except Exception as e:
+            current_app.logger.error(f"APScheduler: Error reconciling chain state: {str(e)}", exc_info=True)
@@ -0,0 +1,198 @@
+# app/utils/response_cache.py
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, request, make_response
+
+from .web3_utils import get_w3
+
+
+class MemoryLRUBackend:
+    """进程内 LRU 缓存后端"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._generations = {}
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_generation(self, namespace):
+        with self._lock:
+            return self._generations.get(namespace, 0)
+
+    def bump_generation(self, namespace):
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+
+
+class RedisBackend:
+    """基于 Redis 的共享缓存后端，多个 gunicorn worker 共享同一份结果"""
+
+    def __init__(self, url, key_prefix='voting:resp:'):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("RESPONSE_CACHE_BACKEND='redis' requires the 'redis' package.") from e
+        self._client = redis.Redis.from_url(url)
+        self.key_prefix = key_prefix
+
+    def get(self, key):
+        raw = self._client.hgetall(self.key_prefix + key)
+        if not raw:
+            return None
+        return {
+            'body': raw[b'body'],
+            'status': int(raw[b'status']),
+            'mimetype': raw[b'mimetype'].decode(),
+            'etag': raw[b'etag'].decode(),
+            'block_number': int(raw[b'block_number'])
+        }
+
+    def set(self, key, value, ttl):
+        full_key = self.key_prefix + key
+        pipe = self._client.pipeline()
+        pipe.hset(full_key, mapping=value)
+        pipe.expire(full_key, max(int(ttl), 1))
+        pipe.execute()
+
+    def get_generation(self, namespace):
+        value = self._client.get(f"{self.key_prefix}gen:{namespace}")
+        return int(value) if value else 0
+
+    def bump_generation(self, namespace):
+        self._client.incr(f"{self.key_prefix}gen:{namespace}")
+
+
+class ResponseCache:
+    """公共只读接口的响应缓存：按最新区块号分区，带 TTL，写操作后按命名空间失效"""
+
+    def __init__(self):
+        self.backend = None
+        self.enabled = False
+        self.default_ttl = 5
+        self.block_poll_interval = 1.0
+        self._block_lock = threading.Lock()
+        self._block_number = None
+        self._block_checked_at = 0.0
+
+    def init_app(self, app):
+        self.enabled = app.config.get('RESPONSE_CACHE_ENABLED', True)
+        self.default_ttl = app.config.get('RESPONSE_CACHE_TTL_SECONDS', 5)
+        self.block_poll_interval = app.config.get('RESPONSE_CACHE_BLOCK_POLL_SECONDS', 1.0)
+        backend_name = app.config.get('RESPONSE_CACHE_BACKEND', 'memory')
+        if backend_name == 'redis':
+            self.backend = RedisBackend(app.config.get('RESPONSE_CACHE_REDIS_URL', 'redis://localhost:6379/0'))
+        else:
+            self.backend = MemoryLRUBackend(app.config.get('RESPONSE_CACHE_MAX_ENTRIES', 1024))
+
+    def latest_block_number(self):
+        """最新区块号，在 block_poll_interval 内复用上一次的查询结果"""
+        with self._block_lock:
+            now = time.monotonic()
+            if self._block_number is None or now - self._block_checked_at >= self.block_poll_interval:
+                self._block_number = get_w3().eth.block_number
+                self._block_checked_at = now
+            return self._block_number
+
+    def invalidate(self, *namespaces):
+        if not self.enabled or self.backend is None:
+            return
+        for namespace in namespaces:
+            try:
+                self.backend.bump_generation(namespace)
+            except Exception as e:
+                current_app.logger.warning(f"Failed to invalidate response cache '{namespace}': {e}")
+        # 强制下一次请求重新读取区块号
+        with self._block_lock:
+            self._block_number = None
+
+    def lookup(self, namespace, query_string=''):
+        """返回 (缓存键, 区块号, 缓存条目或 None)；WSGI 路由与 ASGI 路由共用同一键格式，可命中彼此写入的条目"""
+        block_number = self.latest_block_number()
+        generation = self.backend.get_generation(namespace)
+        key = f"{namespace}:{generation}:{block_number}:{query_string}"
+        return key, block_number, self.backend.get(key)
+
+    def store(self, key, body, mimetype, block_number, ttl=None):
+        entry = {
+            'body': body,
+            'status': 200,
+            'mimetype': mimetype,
+            'etag': hashlib.sha1(body).hexdigest(),
+            'block_number': block_number
+        }
+        self.backend.set(key, entry, ttl or self.default_ttl)
+        return entry
+
+    def cached(self, namespace, ttl=None):
+        """路由装饰器：缓存 200 响应，并支持 ETag/If-None-Match 协商"""
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled or self.backend is None:
+                    return fn(*args, **kwargs)
+
+                entry_ttl = ttl or self.default_ttl
+                try:
+                    key, block_number, entry = self.lookup(namespace, request.query_string.decode())
+                except Exception as e:
+                    current_app.logger.warning(f"Response cache unavailable for '{namespace}': {e}")
+                    return fn(*args, **kwargs)
+
+                if entry is None:
+                    response = make_response(fn(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                    entry = {
+                        'body': response.get_data(),
+                        'status': response.status_code,
+                        'mimetype': response.mimetype,
+                        'block_number': block_number
+                    }
+                    try:
+                        entry = self.store(key, entry['body'], entry['mimetype'], block_number, entry_ttl)
+                    except Exception as e:
+                        current_app.logger.warning(f"Failed to store response cache '{namespace}': {e}")
+
+                response = current_app.response_class(entry['body'], status=entry['status'],
+                                                      mimetype=entry['mimetype'])
+                response.set_etag(entry.get('etag') or hashlib.sha1(entry['body']).hexdigest())
+                response.headers['Cache-Control'] = f"public, max-age={int(entry_ttl)}"
+                response.headers['X-Block-Number'] = str(entry['block_number'])
+                return response.make_conditional(request)
+
+            return wrapper
+        return decorator
+
+
+response_cache = ResponseCache()
+
+
+def init_response_cache(app):
+    response_cache.init_app(app)
+
+
+def get_response_cache():
+    return response_cache
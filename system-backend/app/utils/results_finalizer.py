@@ -0,0 +1,175 @@
+# app/utils/results_finalizer.py
+import hashlib
+import json
+
+from flask import current_app
+from sqlalchemy import func
+from web3 import Web3
+
+from .. import db
+from ..models.models import CandidateDetails, ElectionResult, ElectionResultCandidate, IndexerCursor, Votes
+from .chain_indexer import VOTER_REGISTERED_TOPIC
+from .event_stream import VOTING_ENDED_TOPIC
+from .tally_cache import CANDIDATE_ADDED_TOPIC, VOTED_TOPIC, VOTE_REVOKED_TOPIC
+from .web3_utils import get_candidates_on_chain, get_contract, get_contract_snapshot, get_w3
+
+# 重放到结束区块为止的事件，用于独立计算票数与注册人数
+REPLAYED_TOPICS = [CANDIDATE_ADDED_TOPIC, VOTED_TOPIC, VOTE_REVOKED_TOPIC, VOTER_REGISTERED_TOPIC]
+
+PHASE_CONCLUDED = 2
+
+
+class ResultsFinalizer:
+    """发现 VotingEnded 事件后生成最终结果快照并写入 election_results
+
+    快照由事件重放得到 (截至结束区块的票数与注册人数)，写入前与合约当前状态逐项核对；
+    合约进入 Concluded 后票数不再变化，因此两者必须完全一致，否则不写入并在下次运行时重试。
+    """
+
+    def __init__(self, name='results_finalizer', block_range=5000):
+        self.name = name
+        self.block_range = block_range
+
+    def _get_cursor(self):
+        cursor = IndexerCursor.query.filter_by(name=self.name).first()
+        if not cursor:
+            cursor = IndexerCursor(name=self.name, last_block=-1)
+            db.session.add(cursor)
+            db.session.commit()
+        return cursor
+
+    def _get_logs(self, w3, contract, topics, from_block, to_block):
+        for range_start in range(from_block, to_block + 1, self.block_range):
+            yield from w3.eth.get_logs({
+                'address': contract.address,
+                'fromBlock': range_start,
+                'toBlock': min(range_start + self.block_range - 1, to_block),
+                'topics': [[Web3.to_hex(topic) for topic in topics]]
+            })
+
+    def _replay(self, w3, contract, end_block):
+        """返回截至 end_block 的 ([(name, vote_count), ...], 注册选民数)"""
+        candidates = []
+        registered_voters = 0
+        for log in self._get_logs(w3, contract, REPLAYED_TOPICS, 0, end_block):
+            topic = log['topics'][0]
+            if topic == CANDIDATE_ADDED_TOPIC:
+                args = contract.events.CandidateAdded().process_log(log)['args']
+                while len(candidates) <= args['candidateId']:
+                    candidates.append([None, 0])
+                candidates[args['candidateId']][0] = args['candidateName']
+            elif topic == VOTED_TOPIC:
+                candidates[contract.events.Voted().process_log(log)['args']['candidateId']][1] += 1
+            elif topic == VOTE_REVOKED_TOPIC:
+                candidates[contract.events.VoteRevoked().process_log(log)['args']['candidateId']][1] -= 1
+            else:
+                # 合约保证每个地址只会触发一次 VoterRegistered
+                registered_voters += 1
+        return [(name, count) for name, count in candidates], registered_voters
+
+    @staticmethod
+    def _snapshot_hash(snapshot):
+        canonical = json.dumps(snapshot, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def _finalize(self, w3, contract, log):
+        end_block = log['blockNumber']
+        tx_hash = log['transactionHash'].hex()
+        end_time = contract.events.VotingEnded().process_log(log)['args']['endTime']
+
+        replayed_candidates, registered_voters = self._replay(w3, contract, end_block)
+        phase, start_time = get_contract_snapshot()[:2]
+        chain_candidates = get_candidates_on_chain()
+        if phase != PHASE_CONCLUDED:
+            raise RuntimeError(f"VotingEnded seen at block {end_block} but contract phase is {phase}.")
+        if [tuple(candidate) for candidate in chain_candidates] != replayed_candidates:
+            raise RuntimeError(f"Replayed tally {replayed_candidates} does not match contract state "
+                               f"{chain_candidates} for the election ended at block {end_block}.")
+
+        names = [name for name, _ in replayed_candidates]
+        ids_by_name = dict(db.session.query(CandidateDetails.name, CandidateDetails.id)
+                           .filter(CandidateDetails.name.in_(names)).all()) if names else {}
+        db_counts = dict(db.session.query(Votes.candidate_id, func.count(Votes.id))
+                         .group_by(Votes.candidate_id).all())
+
+        snapshot = {
+            'end_transaction_hash': tx_hash,
+            'block_number': end_block,
+            'start_time': start_time,
+            'end_time': end_time,
+            'registered_voters': registered_voters,
+            'candidates': [[index, name, count] for index, (name, count) in enumerate(replayed_candidates)]
+        }
+        result = ElectionResult(
+            end_transaction_hash=tx_hash,
+            block_number=end_block,
+            start_time=start_time,
+            end_time=end_time,
+            total_votes=sum(count for _, count in replayed_candidates),
+            registered_voters=registered_voters,
+            snapshot_hash=self._snapshot_hash(snapshot)
+        )
+        for index, (name, count) in enumerate(replayed_candidates):
+            candidate_id = ids_by_name.get(name)
+            result.candidates.append(ElectionResultCandidate(
+                candidate_index=index,
+                candidate_id=candidate_id,
+                name=name,
+                vote_count=count,
+                db_vote_count=db_counts.get(candidate_id, 0)
+            ))
+            if candidate_id is not None and db_counts.get(candidate_id, 0) != count:
+                current_app.logger.warning(
+                    f"Results finalizer: candidate '{name}' has {count} votes on chain but "
+                    f"{db_counts.get(candidate_id, 0)} rows in the votes table.")
+        db.session.add(result)
+        return result
+
+    def run_once(self):
+        """处理游标之后的 VotingEnded 事件，返回本次新写入的结果快照列表"""
+        w3 = get_w3()
+        contract = get_contract()
+        cursor = self._get_cursor()
+        latest_block = w3.eth.block_number
+        from_block = cursor.last_block + 1
+        if latest_block < from_block:
+            return []
+
+        finalized = []
+        try:
+            for log in self._get_logs(w3, contract, [VOTING_ENDED_TOPIC], from_block, latest_block):
+                if ElectionResult.query.filter_by(end_transaction_hash=log['transactionHash'].hex()).first():
+                    continue
+                finalized.append(self._finalize(w3, contract, log))
+            cursor.last_block = latest_block
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        for result in finalized:
+            current_app.logger.info(
+                f"Election results finalized at block {result.block_number}: {result.total_votes} votes, "
+                f"{result.registered_voters} registered voters, snapshot {result.snapshot_hash}.")
+        return finalized
+
+
+def finalize_election_results():
+    finalizer = ResultsFinalizer(block_range=current_app.config.get('EVENT_LOG_BLOCK_RANGE', 5000))
+    return finalizer.run_once()
+
+
+def get_final_result():
+    """最近一次定稿的结果 (只读数据库)"""
+    return ElectionResult.query.order_by(ElectionResult.block_number.desc()).first()
+
+
+def job_finalize_election_results():
+    """APScheduler 定时任务入口：在调度器绑定的应用上下文中检查 VotingEnded 并定稿结果"""
+    from app import scheduler
+
+    with scheduler.app.app_context():
+        try:
+            finalize_election_results()
+        except Exception as e:
+            current_app.logger.error(f"APScheduler: Error finalizing election results: {str(e)}", exc_info=True)
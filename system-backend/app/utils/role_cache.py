@@ -0,0 +1,79 @@
+# app/utils/role_cache.py
+import threading
+import time
+from collections import namedtuple
+
+from sqlalchemy import event
+
+# 通过校验的管理员身份，只包含路由函数需要的字段，不绑定数据库会话
+AdminIdentity = namedtuple('AdminIdentity', ['id', 'userid', 'role'])
+
+
+class RoleVerificationCache:
+    """admin_required 的角色校验结果缓存：短时间内同一管理员的请求不再查询数据库
+
+    本进程内修改或删除用户时立即失效；其它进程 (例如 scripts/init_admin.py) 的修改最多在 ttl 秒后生效。
+    """
+
+    def __init__(self, ttl=30, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = {}  # user_id -> (expires_at, AdminIdentity)
+
+    def get(self, user_id):
+        if self.ttl <= 0:
+            return None
+        with self._lock:
+            item = self._entries.get(user_id)
+            if item is None:
+                return None
+            expires_at, identity = item
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            return identity
+
+    def set(self, user_id, identity):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                now = time.monotonic()
+                self._entries = {key: item for key, item in self._entries.items() if item[0] >= now}
+                if len(self._entries) >= self.max_entries:
+                    self._entries.clear()
+            self._entries[user_id] = (time.monotonic() + self.ttl, identity)
+
+    def invalidate(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+
+role_cache = RoleVerificationCache()
+
+
+def _on_role_set(target, value, oldvalue, initiator):
+    if value != oldvalue and target.id is not None:
+        role_cache.invalidate(target.id)
+
+
+def _on_user_deleted(mapper, connection, target):
+    role_cache.invalidate(target.id)
+
+
+def init_role_cache(app):
+    from ..models.models import User
+
+    role_cache.ttl = app.config.get('ADMIN_ROLE_CACHE_TTL_SECONDS', 30)
+    role_cache.max_entries = app.config.get('ADMIN_ROLE_CACHE_MAX_ENTRIES', 1024)
+    if not event.contains(User.role, 'set', _on_role_set):
+        event.listen(User.role, 'set', _on_role_set)
+        event.listen(User, 'after_delete', _on_user_deleted)
+
+
+def get_role_cache():
+    return role_cache
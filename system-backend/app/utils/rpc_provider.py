@@ -0,0 +1,150 @@
+# app/utils/rpc_provider.py
+import itertools
+import logging
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from web3 import HTTPProvider
+from web3._utils.batching import batching_context, sort_batch_response_by_response_ids
+from web3.providers.rpc.utils import check_if_retry_on_failure
+
+# 可以重试/切换节点的网络错误；RPC 层面的错误 (revert 等) 由节点正常返回，不在此列
+TRANSIENT_ERRORS = (requests.ConnectionError, requests.Timeout, requests.HTTPError)
+
+
+class EndpointStats:
+    """单个 RPC 节点的调用统计"""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.last_latency = 0.0
+        self.last_error = None
+        self.unhealthy_until = 0.0  # 出错后的冷却截止时间，之后重新尝试该节点
+
+    @property
+    def healthy(self):
+        return time.monotonic() >= self.unhealthy_until
+
+    def to_dict(self):
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'avg_latency_ms': round(self.total_latency / self.requests * 1000, 3) if self.requests else None,
+            'max_latency_ms': round(self.max_latency * 1000, 3),
+            'last_latency_ms': round(self.last_latency * 1000, 3),
+            'last_error': self.last_error,
+            'healthy': self.healthy
+        }
+
+
+class PooledFailoverHTTPProvider(HTTPProvider):
+    """带连接池、keep-alive、重试退避，并支持多节点轮询/故障转移的 HTTP Provider
+
+    strategy='failover' 时总是优先使用第一个健康节点；'round_robin' 时在节点间轮流分发请求。
+    只有只读等可安全重放的方法会重试或切换节点，eth_sendTransaction 等写操作只发送一次。
+    """
+
+    logger = logging.getLogger("app.utils.rpc_provider")
+
+    def __init__(self, endpoint_uris, pool_size=20, timeout=10, retries=3, backoff_factor=0.1,
+                 strategy='failover', unhealthy_cooldown=30, **kwargs):
+        if isinstance(endpoint_uris, str):
+            endpoint_uris = [endpoint_uris]
+        if not endpoint_uris:
+            raise ValueError("At least one RPC endpoint is required.")
+        super().__init__(endpoint_uris[0], request_kwargs={'timeout': timeout}, **kwargs)
+
+        self.endpoint_uris = list(endpoint_uris)
+        self.timeout = timeout
+        self.retries = max(int(retries), 1)
+        self.backoff_factor = backoff_factor
+        self.strategy = strategy
+        self.unhealthy_cooldown = unhealthy_cooldown
+        self._round_robin = itertools.count()
+        self._stats_lock = threading.Lock()
+        self._stats = {uri: EndpointStats() for uri in self.endpoint_uris}
+        self._sessions = {}
+        for uri in self.endpoint_uris:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers.update(self.get_request_headers())
+            session.headers['Connection'] = 'keep-alive'
+            self._sessions[uri] = session
+
+    def __str__(self):
+        return f"Pooled RPC connection {', '.join(self.endpoint_uris)}"
+
+    def _endpoint_order(self):
+        if self.strategy == 'round_robin':
+            start = next(self._round_robin) % len(self.endpoint_uris)
+            ordered = self.endpoint_uris[start:] + self.endpoint_uris[:start]
+        else:
+            ordered = list(self.endpoint_uris)
+        # 健康节点优先，不健康的节点放到最后作为兜底
+        with self._stats_lock:
+            return sorted(ordered, key=lambda uri: not self._stats[uri].healthy)
+
+    def _record(self, uri, latency, error=None):
+        with self._stats_lock:
+            stats = self._stats[uri]
+            stats.requests += 1
+            stats.total_latency += latency
+            stats.last_latency = latency
+            stats.max_latency = max(stats.max_latency, latency)
+            if error is None:
+                stats.unhealthy_until = 0.0
+            else:
+                stats.errors += 1
+                stats.last_error = str(error)
+                stats.unhealthy_until = time.monotonic() + self.unhealthy_cooldown
+
+    def _post(self, uri, request_data):
+        started = time.perf_counter()
+        try:
+            response = self._sessions[uri].post(uri, data=request_data, timeout=self.timeout)
+            response.raise_for_status()
+        except TRANSIENT_ERRORS as e:
+            self._record(uri, time.perf_counter() - started, e)
+            raise
+        self._record(uri, time.perf_counter() - started)
+        return response.content
+
+    def _send(self, request_data, retryable):
+        endpoints = self._endpoint_order()
+        if not retryable:
+            return self._post(endpoints[0], request_data)
+
+        last_error = None
+        for attempt in range(self.retries):
+            for uri in endpoints:
+                try:
+                    return self._post(uri, request_data)
+                except TRANSIENT_ERRORS as e:
+                    last_error = e
+                    self.logger.warning(f"RPC request to {uri} failed (attempt {attempt + 1}): {e}")
+            if attempt < self.retries - 1:
+                time.sleep(self.backoff_factor * 2 ** attempt)
+        raise last_error
+
+    def _make_request(self, method, request_data):
+        return self._send(request_data, retryable=check_if_retry_on_failure(method))
+
+    @batching_context
+    def make_batch_request(self, batch_requests):
+        request_data = self.encode_batch_rpc_request(batch_requests)
+        retryable = all(check_if_retry_on_failure(method) for method, _ in batch_requests)
+        response = self.decode_rpc_response(self._send(request_data, retryable=retryable))
+        if not isinstance(response, list):
+            return response
+        return sort_batch_response_by_response_ids(response)
+
+    def get_endpoint_stats(self):
+        with self._stats_lock:
+            return {uri: stats.to_dict() for uri, stats in self._stats.items()}
@@ -0,0 +1,181 @@
+# app/utils/scheduler_leader.py
+import atexit
+import os
+import socket
+import threading
+import time
+import uuid
+
+from sqlalchemy import DateTime, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+
+from .. import db
+from ..models.models import SchedulerLease
+
+
+class db_utc_now(FunctionElement):
+    """数据库服务器的当前 UTC 时间加上 offset 秒
+
+    租约的比较与续期都只使用数据库的时钟，多台主机之间的本地时钟偏差不会让两个进程同时持有租约。
+    """
+    type = DateTime()
+    inherit_cache = False
+
+    def __init__(self, offset=0):
+        self.offset = int(offset)
+        super().__init__()
+
+
+@compiles(db_utc_now)
+def _compile_db_utc_now(element, compiler, **kw):
+    return f"DATE_ADD(UTC_TIMESTAMP(6), INTERVAL {element.offset} SECOND)"
+
+
+@compiles(db_utc_now, 'sqlite')
+def _compile_db_utc_now_sqlite(element, compiler, **kw):
+    return f"strftime('%Y-%m-%d %H:%M:%f', 'now', '{element.offset:+d} seconds')"
+
+
+class SchedulerLeader:
+    """基于数据库租约行的调度器主节点选举
+
+    每个服务进程启动一个守护线程，每隔 renew_interval 秒执行一条条件 UPDATE：
+    租约属于自己或已过期时写入自己的标识并把过期时间推后 ttl 秒。成功即成为主节点并调用 on_elected
+    (启动 APScheduler 并注册任务)；其它进程不启动调度器，只保留这一条周期性 UPDATE。
+    主节点连续续约失败、租约即将过期时先调用 on_demoted 停止执行任务，避免与接管的进程同时运行；
+    进程退出时主动让出租约，其它进程在下一次尝试时即可接管。
+    """
+
+    def __init__(self, app, name='scheduler', ttl=30, renew_interval=10, on_elected=None, on_demoted=None):
+        self.app = app
+        self.name = name
+        self.ttl = ttl
+        self.renew_interval = renew_interval
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._is_leader = False
+        self._last_renewed = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def is_leader(self):
+        return self._is_leader
+
+    def try_acquire(self):
+        """获取或续约租约，返回是否持有租约"""
+        result = db.session.execute(
+            update(SchedulerLease)
+            .where(SchedulerLease.name == self.name,
+                   or_(SchedulerLease.holder == self.holder, SchedulerLease.expires_at < db_utc_now()))
+            .values(holder=self.holder, expires_at=db_utc_now(self.ttl))
+        )
+        if result.rowcount:
+            db.session.commit()
+            return True
+
+        db.session.rollback()
+        if db.session.query(SchedulerLease.id).filter_by(name=self.name).first() is not None:
+            return False
+        db.session.add(SchedulerLease(name=self.name, holder=self.holder, expires_at=db_utc_now(self.ttl)))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # 其它进程同时创建了租约
+            db.session.rollback()
+            return False
+        return True
+
+    def release(self):
+        """让出租约 (只影响自己持有的租约)"""
+        if not self._is_leader:
+            return
+        with self.app.app_context():
+            db.session.execute(
+                update(SchedulerLease)
+                .where(SchedulerLease.name == self.name, SchedulerLease.holder == self.holder)
+                .values(expires_at=db_utc_now(-1))
+            )
+            db.session.commit()
+        self._set_leader(False)
+
+    def _set_leader(self, is_leader):
+        if is_leader == self._is_leader:
+            return
+        self._is_leader = is_leader
+        callback = self.on_elected if is_leader else self.on_demoted
+        self.app.logger.info(
+            f"Scheduler lease '{self.name}' {'acquired' if is_leader else 'lost'} by {self.holder}.")
+        if callback:
+            try:
+                callback(self.app)
+            except Exception as e:
+                self.app.logger.error(f"Scheduler leader callback failed: {str(e)}", exc_info=True)
+
+    def run_once(self):
+        with self.app.app_context():
+            try:
+                acquired = self.try_acquire()
+            except Exception as e:
+                db.session.rollback()
+                self.app.logger.warning(f"Scheduler lease renewal failed: {str(e)}")
+                # 无法确认租约时，在它可能被其它进程接管之前停止执行任务
+                if self._is_leader and time.monotonic() - self._last_renewed >= self.ttl - self.renew_interval:
+                    self._set_leader(False)
+                return self._is_leader
+            finally:
+                db.session.remove()
+        if acquired:
+            self._last_renewed = time.monotonic()
+        self._set_leader(acquired)
+        return acquired
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.run_once()
+            self._stop.wait(self.renew_interval)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='scheduler-leader', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        try:
+            self.release()
+        except Exception as e:
+            self.app.logger.warning(f"Failed to release scheduler lease: {str(e)}")
+
+
+scheduler_leader = None
+
+
+def init_scheduler_leader(app, on_elected, on_demoted=None):
+    global scheduler_leader
+    if scheduler_leader is not None:
+        scheduler_leader.stop()
+    scheduler_leader = SchedulerLeader(
+        app,
+        name=app.config.get('SCHEDULER_LEASE_NAME', 'scheduler'),
+        ttl=app.config.get('SCHEDULER_LEASE_TTL_SECONDS', 30),
+        renew_interval=app.config.get('SCHEDULER_LEASE_RENEW_SECONDS', 10),
+        on_elected=on_elected,
+        on_demoted=on_demoted
+    )
+    scheduler_leader.start()
+    atexit.register(scheduler_leader.stop)
+    return scheduler_leader
+
+
+def is_scheduler_leader():
+    """当前进程是否运行定时任务；未启用选举时以调度器是否在运行为准"""
+    if scheduler_leader is not None:
+        return scheduler_leader.is_leader
+    from app import scheduler
+    return scheduler.running
@@ -0,0 +1,90 @@
+# app/utils/tally_cache.py
+import threading
+
+from web3 import Web3
+
+from .web3_utils import get_contract, get_w3
+
+# 合约事件签名，用于在一次 eth_getLogs 中同时拉取三种事件
+CANDIDATE_ADDED_TOPIC = Web3.keccak(text="CandidateAdded(uint256,string)")
+VOTED_TOPIC = Web3.keccak(text="Voted(address,uint256)")
+VOTE_REVOKED_TOPIC = Web3.keccak(text="VoteRevoked(address,uint256)")
+TALLY_TOPICS = [CANDIDATE_ADDED_TOPIC, VOTED_TOPIC, VOTE_REVOKED_TOPIC]
+
+
+class CandidateTallyCache:
+    """基于合约事件维护的候选人票数缓存（进程内）"""
+
+    def __init__(self, block_range=5000):
+        self.block_range = block_range
+        self._lock = threading.Lock()
+        self._candidates = []  # 下标即链上候选人索引，元素为 [name, vote_count]
+        self._last_block = -1  # 已处理到的区块高度
+
+    def reset(self):
+        with self._lock:
+            self._candidates = []
+            self._last_block = -1
+
+    def sync(self):
+        """拉取上次同步之后的新事件并更新内存中的票数，返回缓存对应的区块高度"""
+        w3 = get_w3()
+        contract = get_contract()
+
+        with self._lock:
+            latest_block = w3.eth.block_number
+
+            # 链被重置 (例如 Ganache 重启)，从头重建
+            if latest_block < self._last_block:
+                self._candidates = []
+                self._last_block = -1
+
+            from_block = self._last_block + 1
+            while from_block <= latest_block:
+                to_block = min(from_block + self.block_range - 1, latest_block)
+                logs = w3.eth.get_logs({
+                    'address': contract.address,
+                    'fromBlock': from_block,
+                    'toBlock': to_block,
+                    'topics': [[Web3.to_hex(topic) for topic in TALLY_TOPICS]]
+                })
+                for log in logs:
+                    self._apply_log(contract, log)
+                self._last_block = to_block
+                from_block = to_block + 1
+
+            return self._last_block
+
+    def _apply_log(self, contract, log):
+        topic = log['topics'][0]
+        if topic == CANDIDATE_ADDED_TOPIC:
+            args = contract.events.CandidateAdded().process_log(log)['args']
+            candidate_id = args['candidateId']
+            # 事件按顺序到达，candidateId 等于当前列表长度
+            while len(self._candidates) <= candidate_id:
+                self._candidates.append([None, 0])
+            self._candidates[candidate_id][0] = args['candidateName']
+        elif topic == VOTED_TOPIC:
+            args = contract.events.Voted().process_log(log)['args']
+            self._candidates[args['candidateId']][1] += 1
+        elif topic == VOTE_REVOKED_TOPIC:
+            args = contract.events.VoteRevoked().process_log(log)['args']
+            self._candidates[args['candidateId']][1] -= 1
+
+    def snapshot(self):
+        """同步后返回 (候选人列表 [(name, vote_count), ...], 区块高度)"""
+        block_number = self.sync()
+        with self._lock:
+            return [(name, count) for name, count in self._candidates], block_number
+
+
+tally_cache = CandidateTallyCache()
+
+
+def init_tally_cache(app):
+    tally_cache.block_range = app.config.get('EVENT_LOG_BLOCK_RANGE', 5000)
+    tally_cache.reset()
+
+
+def get_tally_cache():
+    return tally_cache
@@ -0,0 +1,161 @@
+# app/utils/vote_pipeline.py
+import time
+import uuid
+from datetime import datetime, timedelta, UTC
+
+from flask import current_app
+from web3 import Web3
+from web3.exceptions import TransactionNotFound
+
+from .. import db
+from ..models.models import CandidateDetails, PendingVote, Votes
+from .gas_policy import get_gas_policy
+from .web3_utils import get_contract, get_w3, supports_batching
+from .response_cache import response_cache
+
+
+def submit_vote_async(voter_record, voter_eth_address, candidate_index):
+    """发送投票交易但不等待回执，记录一条待确认投票并返回"""
+    contract = get_contract()
+    vote_function = contract.functions.vote(candidate_index)
+    tx_hash = vote_function.transact(get_gas_policy().apply(vote_function, {'from': voter_eth_address}))
+
+    pending_vote = PendingVote(
+        ticket_id=str(uuid.uuid4()),
+        voter_id=voter_record.id,
+        candidate_index_on_chain=candidate_index,
+        transaction_hash=tx_hash.hex(),
+        status='pending'
+    )
+    db.session.add(pending_vote)
+    db.session.commit()
+    return pending_vote
+
+
+def _fetch_receipts(tx_hashes):
+    """查询多个交易回执，返回 {tx_hash: (status, block_number)}，未上链的交易对应 None
+
+    支持批量请求的 provider 只需一次 JSON-RPC 往返，其它 provider (例如 eth-tester) 逐个查询。
+    """
+    w3 = get_w3()
+    if not supports_batching(w3):
+        receipts = {}
+        for tx_hash in tx_hashes:
+            try:
+                receipt = w3.eth.get_transaction_receipt(tx_hash)
+                receipts[tx_hash] = (receipt['status'], receipt['blockNumber'])
+            except TransactionNotFound:
+                receipts[tx_hash] = None
+        return receipts
+
+    responses = w3.provider.make_batch_request(
+        [('eth_getTransactionReceipt', [Web3.to_hex(hexstr=tx_hash)]) for tx_hash in tx_hashes])
+    if not isinstance(responses, list):
+        raise RuntimeError(f"Batch receipt request failed: {responses.get('error')}")
+    receipts = {}
+    for tx_hash, response in zip(tx_hashes, responses):
+        receipt = response.get('result')
+        receipts[tx_hash] = (int(receipt['status'], 16), int(receipt['blockNumber'], 16)) if receipt else None
+    return receipts
+
+
+def _finalize_pending_vote(pending_vote, receipt, candidate_names):
+    """根据回执 (status, block_number) 把待确认投票转为正式投票记录，或标记为失败"""
+    status, block_number = receipt
+    if status != 1:
+        pending_vote.status = 'failed'
+        pending_vote.error_message = "Transaction reverted on chain."
+        return
+
+    candidate_index = pending_vote.candidate_index_on_chain
+    if candidate_index not in candidate_names:
+        candidate_names[candidate_index], _ = get_contract().functions.getCandidate(candidate_index).call()
+    candidate_detail_db = CandidateDetails.query.filter_by(name=candidate_names[candidate_index]).first()
+    if not candidate_detail_db:
+        pending_vote.status = 'failed'
+        pending_vote.error_message = (f"Candidate '{candidate_names[candidate_index]}' "
+                                      f"not found in local database details.")
+        return
+
+    new_vote_db = Votes(
+        voter_id=pending_vote.voter_id,
+        candidate_id=candidate_detail_db.id,
+        transaction_hash=pending_vote.transaction_hash,
+        block_number=block_number,
+        voted_at_on_chain=datetime.now(UTC)
+    )
+    db.session.add(new_vote_db)
+    db.session.flush()
+    pending_vote.status = 'confirmed'
+    pending_vote.vote_id = new_vote_db.id
+
+
+def _as_utc(value):
+    # created_at 以 UTC 写入，数据库返回的是不带时区的时间
+    return value.replace(tzinfo=UTC) if value.tzinfo is None else value
+
+
+def poll_pending_vote_receipts():
+    """批量检查所有待确认投票的交易回执，确认或回滚对应的数据库记录
+
+    按 id 分批 (每批 VOTE_RECEIPT_BATCH_SIZE 条，一次批量 RPC) 遍历全部待确认记录，
+    未上链的旧记录不会挡住之后的记录；单次运行最多持续一个轮询间隔，剩余的留给下一次运行。
+    """
+    batch_size = current_app.config.get('VOTE_RECEIPT_BATCH_SIZE', 200)
+    receipt_timeout = current_app.config.get('VOTE_RECEIPT_TIMEOUT_SECONDS', 600)
+    deadline = time.monotonic() + current_app.config.get('VOTE_RECEIPT_POLL_INTERVAL_SECONDS', 2)
+    summary = {'confirmed': 0, 'failed': 0, 'still_pending': 0}
+    candidate_names = {}
+    last_id = 0
+
+    while True:
+        pending_votes = PendingVote.query.filter(PendingVote.status == 'pending', PendingVote.id > last_id) \
+            .order_by(PendingVote.id).limit(batch_size).all()
+        if not pending_votes:
+            break
+        last_id = pending_votes[-1].id
+        _process_receipt_batch(pending_votes, receipt_timeout, candidate_names, summary)
+        if len(pending_votes) < batch_size or time.monotonic() >= deadline:
+            break
+
+    if summary['confirmed']:
+        response_cache.invalidate('candidates')
+    current_app.logger.info(f"Pending vote receipt poll finished: {summary}")
+    return summary
+
+
+def _process_receipt_batch(pending_votes, receipt_timeout, candidate_names, summary):
+    receipts = _fetch_receipts([pending_vote.transaction_hash for pending_vote in pending_votes])
+    expire_before = datetime.now(UTC) - timedelta(seconds=receipt_timeout)
+
+    for pending_vote in pending_votes:
+        receipt = receipts.get(pending_vote.transaction_hash)
+        try:
+            if receipt is None:
+                if pending_vote.created_at and _as_utc(pending_vote.created_at) < expire_before:
+                    pending_vote.status = 'failed'
+                    pending_vote.error_message = f"No receipt within {receipt_timeout} seconds."
+                else:
+                    summary['still_pending'] += 1
+                    continue
+            else:
+                _finalize_pending_vote(pending_vote, receipt, candidate_names)
+            db.session.commit()
+            summary[pending_vote.status] += 1
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(
+                f"Error finalizing pending vote {pending_vote.ticket_id} "
+                f"(TX: {pending_vote.transaction_hash}): {str(e)}", exc_info=True)
+            summary['still_pending'] += 1
+
+
+def job_poll_pending_votes():
+    """APScheduler 定时任务入口：在调度器绑定的应用上下文中轮询回执"""
+    from app import scheduler
+
+    with scheduler.app.app_context():
+        try:
+            poll_pending_vote_receipts()
+        except Exception as e:
+            current_app.logger.error(f"APScheduler: Error polling pending vote receipts: {str(e)}", exc_info=True)
@@ -0,0 +1,168 @@
+# app/utils/voting_lifecycle.py
+import time
+from datetime import datetime, timedelta, UTC
+
+from flask import current_app
+from web3.exceptions import TransactionNotFound
+
+from .nonce_manager import get_nonce_manager
+from .response_cache import response_cache
+from .scheduler_leader import is_scheduler_leader
+from .web3_utils import get_contract, get_w3
+
+AUTO_START_JOB_ID = 'auto_start_voting'
+AUTO_END_JOB_ID = 'auto_end_voting'
+
+PHASE_PENDING = 0
+PHASE_ACTIVE = 1
+
+
+def _scheduler():
+    from app import scheduler
+    return scheduler
+
+
+def _schedule_at(job_id, func, timestamp, args=None):
+    run_date = datetime.fromtimestamp(timestamp, tz=UTC)
+    if not is_scheduler_leader():
+        # 调度器只在主节点进程运行，由主节点的同步任务按合约状态安排
+        return run_date
+    job = _scheduler().get_job(job_id)
+    if job and job.next_run_time == run_date:
+        return run_date
+    _scheduler().add_job(id=job_id, func=func, trigger='date', run_date=run_date, args=args or [],
+                         replace_existing=True, misfire_grace_time=None)
+    return run_date
+
+
+def schedule_auto_start(start_time):
+    """在 start_time (Unix 秒) 自动调用 startVoting；重复调用会替换之前的任务"""
+    return _schedule_at(AUTO_START_JOB_ID, 'app.utils.voting_lifecycle:job_start_voting', start_time)
+
+
+def schedule_auto_end(end_time):
+    """在 end_time (Unix 秒) 自动调用 endVoting；延长截止时间后再次调用即可改期"""
+    if not current_app.config.get('AUTO_END_VOTING_ENABLED', True):
+        return None
+    return _schedule_at(AUTO_END_JOB_ID, 'app.utils.voting_lifecycle:job_end_voting', end_time)
+
+
+def cancel_job(job_id):
+    scheduler = _scheduler()
+    if is_scheduler_leader() and scheduler.get_job(job_id):
+        scheduler.remove_job(job_id)
+
+
+def _receipt_pending(action):
+    return any(job.id.startswith('lifecycle_receipt_') and job.args[1] == action for job in _scheduler().get_jobs())
+
+
+def sync_lifecycle_jobs():
+    """按合约当前状态安排自动开始/结束任务
+
+    主节点定期执行：任务存储在内存中，进程重启或主节点切换后据此恢复；其它进程处理的设置周期、
+    延长截止时间等请求也由这里转为主节点上的任务。开始时间已过但仍未开始的投票会立即尝试开始。
+    """
+    phase, start_time, end_time, _ = get_contract().functions.getVotingStatus().call()
+    now = time.time()
+    if phase == PHASE_PENDING and end_time > now and not _receipt_pending('start'):
+        schedule_auto_start(start_time)
+    if (phase == PHASE_ACTIVE or (phase == PHASE_PENDING and end_time > now)) and not _receipt_pending('end'):
+        schedule_auto_end(end_time)
+
+
+def track_receipt(tx_hash, action):
+    """不阻塞调度线程等待回执，而是安排轮询任务确认交易结果"""
+    deadline = time.time() + current_app.config.get('LIFECYCLE_RECEIPT_TIMEOUT_SECONDS', 600)
+    _schedule_receipt_check(tx_hash, action, deadline)
+
+
+def _schedule_receipt_check(tx_hash, action, deadline):
+    run_date = datetime.now(UTC) + timedelta(seconds=current_app.config.get('LIFECYCLE_RECEIPT_POLL_SECONDS', 2))
+    _scheduler().add_job(id=f"lifecycle_receipt_{tx_hash}", func='app.utils.voting_lifecycle:job_check_receipt',
+                         trigger='date', run_date=run_date, args=[tx_hash, action, deadline],
+                         replace_existing=True, misfire_grace_time=None)
+
+
+def start_voting_if_pending():
+    contract = get_contract()
+    phase, start_time, end_time, block_time = contract.functions.getVotingStatus().call()
+    if phase != PHASE_PENDING:
+        current_app.logger.warning(
+            f"APScheduler: Auto-start skipped, contract phase is {phase} (start {start_time}, end {end_time}, "
+            f"block time {block_time}).")
+        return None
+
+    tx_hash = get_nonce_manager().transact(contract.functions.startVoting(), {'from': get_w3().eth.default_account})
+    current_app.logger.info(f"APScheduler: Auto-start voting transaction sent. TX Hash: {tx_hash.hex()}")
+    track_receipt(tx_hash.hex(), 'start')
+    schedule_auto_end(end_time)
+    return tx_hash
+
+
+def end_voting_if_due():
+    contract = get_contract()
+    phase, _, end_time, _ = contract.functions.getVotingStatus().call()
+    if phase != PHASE_ACTIVE:
+        current_app.logger.info(f"APScheduler: Auto-end skipped, contract phase is {phase}.")
+        return None
+    if end_time > time.time():
+        # 截止时间已被延长 (例如由其它实例)，按合约中的时间改期
+        schedule_auto_end(end_time)
+        current_app.logger.info(f"APScheduler: Voting deadline is now {end_time}, auto-end rescheduled.")
+        return None
+
+    tx_hash = get_nonce_manager().transact(contract.functions.endVoting(), {'from': get_w3().eth.default_account})
+    current_app.logger.info(f"APScheduler: Auto-end voting transaction sent. TX Hash: {tx_hash.hex()}")
+    track_receipt(tx_hash.hex(), 'end')
+    return tx_hash
+
+
+def check_receipt(tx_hash, action, deadline):
+    try:
+        receipt = get_w3().eth.get_transaction_receipt(tx_hash)
+    except TransactionNotFound:
+        receipt = None
+    if receipt is None:
+        if time.time() < deadline:
+            _schedule_receipt_check(tx_hash, action, deadline)
+        else:
+            current_app.logger.error(f"APScheduler: Auto-{action} voting TX {tx_hash} was not mined in time.")
+        return None
+
+    response_cache.invalidate('voting_status', 'election_deadline')
+    if receipt.status != 1:
+        current_app.logger.error(f"APScheduler: Auto-{action} voting TX {tx_hash} failed. Receipt: {receipt}")
+        return receipt
+
+    current_app.logger.info(f"APScheduler: Auto-{action} voting confirmed in block {receipt.blockNumber}.")
+    if action == 'end':
+        from .results_finalizer import finalize_election_results
+        finalize_election_results()
+    return receipt
+
+
+def _run_job(fn, *args):
+    """在调度器绑定的应用上下文中执行，复用已初始化的 Web3/合约实例，而不是每次重新创建应用"""
+    scheduler = _scheduler()
+    with scheduler.app.app_context():
+        try:
+            return fn(*args)
+        except Exception as e:
+            current_app.logger.error(f"APScheduler: Error in {fn.__name__}: {str(e)}", exc_info=True)
+
+
+def job_start_voting():
+    _run_job(start_voting_if_pending)
+
+
+def job_end_voting():
+    _run_job(end_voting_if_due)
+
+
+def job_check_receipt(tx_hash, action, deadline):
+    _run_job(check_receipt, tx_hash, action, deadline)
+
+
+def job_sync_lifecycle_jobs():
+    _run_job(sync_lifecycle_jobs)
@@ -1,69 +1,292 @@
 # app/utils/web3_utils.py
+from flask import current_app
 from web3 import Web3
+from web3.providers import JSONBaseProvider
 import json
 import os
+import threading
+import time
+
+from .gas_policy import init_gas_policy
+from .metrics import instrument_web3
+from .nonce_manager import DatabaseNonceCoordinator, init_nonce_manager
+from .rpc_provider import PooledFailoverHTTPProvider
 
 w3_instance = None
 contract_instance = None
 ganache_accounts_list = []
 
+_warmup_lock = threading.Lock()
+_ready = False
+_last_warmup_failure = None
+_warmup_retry_seconds = 5.0
+_logger = None
 
-def init_web3(app):
-    global w3_instance, contract_instance, ganache_accounts_list
+_health_lock = threading.Lock()
+_health_check_seconds = 5.0
+_health_checked_at = None
+_health_result = None  # (最新区块号, 错误信息或 None)
 
-    rpc_url = app.config.get('GANACHE_RPC_URL')
-    contract_address = app.config.get('CONTRACT_ADDRESS')
 
+def _read_abi(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)['abi']
+
+
+def write_compact_abi(source_path, target_path, abi=None):
+    """从完整的构建产物中只提取 ABI 写入精简文件，并记录源文件的修改时间与大小用于判断是否过期"""
+    stat = os.stat(source_path)
+    if abi is None:
+        abi = _read_abi(source_path)
+    os.makedirs(os.path.dirname(target_path) or '.', exist_ok=True)
+    tmp_path = f"{target_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'source': os.path.abspath(source_path), 'source_mtime_ns': stat.st_mtime_ns,
+                   'source_size': stat.st_size, 'abi': abi}, f, separators=(',', ':'))
+    os.replace(tmp_path, target_path)
+    return abi
+
+
+def load_contract_abi(app):
+    """读取 CONTRACT_ABI_PATH 指向的 truffle 构建产物中的 ABI
+
+    完整的构建产物包含字节码、AST 与 sourcemap，解析开销远大于 ABI 本身；启用 CONTRACT_ABI_CACHE 时
+    首次解析后把 ABI 写入 CONTRACT_ABI_CACHE_DIR (默认为实例目录) 下的精简文件，之后只要源文件未变就直接读取它。
+    """
     raw_abi_path = app.config.get('CONTRACT_ABI_PATH')
+    if not raw_abi_path:
+        raise ValueError("CONTRACT_ABI_PATH is not configured properly.")
 
     # system-backend 目录的路径
     backend_dir = os.path.abspath(os.path.join(app.root_path, '..'))
     # 将 raw_abi_path (它是相对于 config.py 即 backend_dir 的) 解析为绝对路径
     absolute_abi_path = os.path.abspath(os.path.join(backend_dir, raw_abi_path))
 
-    if not rpc_url or not contract_address or not absolute_abi_path:
-        raise ValueError("GANACHE_RPC_URL, CONTRACT_ADDRESS, or CONTRACT_ABI_PATH is not configured properly.")
-
     if not os.path.exists(absolute_abi_path):
         raise FileNotFoundError(
             f"Contract ABI file not found at: {absolute_abi_path}. Check CONTRACT_ABI_PATH in config.py and file "
             f"location.")
 
-    w3_instance = Web3(Web3.HTTPProvider(rpc_url))
+    if not app.config.get('CONTRACT_ABI_CACHE', True):
+        return _read_abi(absolute_abi_path)
+
+    cache_dir = os.path.join(backend_dir, app.config.get('CONTRACT_ABI_CACHE_DIR') or app.instance_path)
+    compact_path = os.path.join(cache_dir, os.path.splitext(os.path.basename(absolute_abi_path))[0] + '.abi.json')
+    stat = os.stat(absolute_abi_path)
+    try:
+        with open(compact_path, 'r', encoding='utf-8') as f:
+            compact = json.load(f)
+        if (compact.get('source') == absolute_abi_path and compact.get('source_mtime_ns') == stat.st_mtime_ns
+                and compact.get('source_size') == stat.st_size):
+            return compact['abi']
+    except (OSError, ValueError, KeyError):
+        pass
+
+    abi = _read_abi(absolute_abi_path)
+    try:
+        write_compact_abi(absolute_abi_path, compact_path, abi=abi)
+    except OSError as e:
+        app.logger.warning(f"Failed to write compact ABI artifact to {compact_path}: {e}")
+    return abi
 
-    if not w3_instance.is_connected():
-        raise ConnectionError(f"Failed to connect to Ganache at {rpc_url}")
 
-    with open(absolute_abi_path, 'r', encoding='utf-8') as f:
-        contract_json = json.load(f)
-        contract_abi = contract_json['abi']
+def init_web3(app, provider=None):
+    """初始化 Web3 与合约实例；provider 为空时按 GANACHE_RPC_URL 创建 HTTP 连接 (基准测试可传入进程内的链)
+
+    这里只创建对象，不访问节点。WEB3_LAZY_INIT 为 False 时立即预热 (连接检查并读取账户，失败时抛出异常)；
+    否则推迟到第一次 get_w3()/get_contract() 或后台预热线程。
+    """
+    global w3_instance, contract_instance, ganache_accounts_list, _ready, _last_warmup_failure, \
+        _warmup_retry_seconds, _logger, _health_check_seconds, _health_checked_at
+
+    rpc_url = app.config.get('GANACHE_RPC_URL')
+    contract_address = app.config.get('CONTRACT_ADDRESS')
+
+    if (not rpc_url and provider is None) or not contract_address:
+        raise ValueError("GANACHE_RPC_URL or CONTRACT_ADDRESS is not configured properly.")
+
+    contract_abi = load_contract_abi(app)
+
+    if provider is None:
+        # GANACHE_RPC_URL 可以是单个地址，也可以是多个节点地址组成的列表 (轮询或故障转移)
+        provider = PooledFailoverHTTPProvider(
+            rpc_url,
+            pool_size=app.config.get('RPC_POOL_SIZE', 20),
+            timeout=app.config.get('RPC_TIMEOUT_SECONDS', 10),
+            retries=app.config.get('RPC_MAX_RETRIES', 3),
+            backoff_factor=app.config.get('RPC_RETRY_BACKOFF_SECONDS', 0.1),
+            strategy=app.config.get('RPC_ENDPOINT_STRATEGY', 'failover'),
+            unhealthy_cooldown=app.config.get('RPC_UNHEALTHY_COOLDOWN_SECONDS', 30)
+        )
+    w3 = Web3(provider)
+    # 记录每次 RPC 调用的耗时 (/metrics 与 Server-Timing)
+    instrument_web3(w3)
 
     # 将字符串地址转换为校验和地址
     checksum_address = Web3.to_checksum_address(contract_address)
-    contract_instance = w3_instance.eth.contract(address=checksum_address, abi=contract_abi)
+    contract = w3.eth.contract(address=checksum_address, abi=contract_abi)
+
+    with _warmup_lock:
+        w3_instance, contract_instance = w3, contract
+        ganache_accounts_list = []
+        _ready = False
+        _last_warmup_failure = None
+        _warmup_retry_seconds = app.config.get('WEB3_WARMUP_RETRY_SECONDS', 5.0)
+        _logger = app.logger
+        _health_check_seconds = app.config.get('WEB3_HEALTH_CHECK_SECONDS', 5.0)
+        _health_checked_at = None
+
+    # 管理员账户的交易由本地 nonce 分配器统一编号，支持并发发送；gas 上限与手续费由缓存的 gas 策略补全
+    coordinator = DatabaseNonceCoordinator() if app.config.get('NONCE_COORDINATION', 'database') == 'database' else None
+    init_nonce_manager(w3, gas_policy=init_gas_policy(w3, app), coordinator=coordinator)
+
+    if not app.config.get('WEB3_LAZY_INIT', True):
+        warmup()
+
 
-    # 设置一个默认账户，用于发送交易，这里使用 Ganache 的第一个账户作为管理员
-    if w3_instance.eth.accounts:
-        w3_instance.eth.default_account = w3_instance.eth.accounts[0]
-        ganache_accounts_list = w3_instance.eth.accounts
-        app.logger.info(f"Default Ethereum account set to: {w3_instance.eth.default_account}")
-        app.logger.info(f"Total Ganache accounts available: {len(ganache_accounts_list)}")
-    else:
-        print("Warning: No Ethereum accounts found in Ganache provider.")
+def warmup():
+    """检查节点连接并读取账户列表，完成后 get_w3()/get_contract() 直接返回
+
+    失败后的 WEB3_WARMUP_RETRY_SECONDS 秒内直接抛出 ConnectionError 而不再访问节点，
+    节点不可用时请求快速失败，而不是每个请求都等待连接超时。
+    """
+    global ganache_accounts_list, _ready, _last_warmup_failure
+    if _ready:
+        return
+    with _warmup_lock:
+        if _ready:
+            return
+        if not w3_instance:
+            raise RuntimeError("Web3 not initialized. Call init_web3 first within app context.")
+        if _last_warmup_failure is not None and time.monotonic() - _last_warmup_failure < _warmup_retry_seconds:
+            raise ConnectionError(f"Ethereum node at {w3_instance.provider} is unavailable, retrying later.")
+
+        started = time.perf_counter()
+        try:
+            if not w3_instance.is_connected():
+                raise ConnectionError(f"Failed to connect to Ganache at {w3_instance.provider}")
+            accounts = w3_instance.eth.accounts
+        except Exception:
+            _last_warmup_failure = time.monotonic()
+            raise
+
+        # 设置一个默认账户，用于发送交易，这里使用 Ganache 的第一个账户作为管理员
+        if accounts:
+            w3_instance.eth.default_account = accounts[0]
+            ganache_accounts_list = accounts
+            _logger.info(f"Default Ethereum account set to: {w3_instance.eth.default_account}")
+            _logger.info(f"Total Ganache accounts available: {len(ganache_accounts_list)}")
+        else:
+            _logger.warning("No Ethereum accounts found in Ganache provider.")
+        _ready = True
+    _logger.info(f"Web3 warmup completed in {(time.perf_counter() - started) * 1000:.1f} ms.")
+
+
+def is_web3_ready():
+    return _ready
+
+
+def check_node_health():
+    """就绪检查: 预热完成后每 WEB3_HEALTH_CHECK_SECONDS 秒最多向节点发送一次 eth_blockNumber，期间复用结果
+
+    返回最新区块号；节点不可用时抛出 ConnectionError。预热之后节点宕机也会如实反映，
+    而负载均衡器的频繁探测不会变成对节点的频繁请求。
+    """
+    global _health_checked_at, _health_result
+    warmup()
+    with _health_lock:
+        now = time.monotonic()
+        if _health_checked_at is None or now - _health_checked_at >= _health_check_seconds:
+            try:
+                _health_result = (w3_instance.eth.block_number, None)
+            except Exception as e:
+                _health_result = (None, str(e))
+            _health_checked_at = time.monotonic()
+        block_number, error = _health_result
+    if error is not None:
+        raise ConnectionError(f"Ethereum node at {w3_instance.provider} is unavailable: {error}")
+    return block_number
+
+
+def start_background_warmup(app):
+    """在后台线程中预热，使第一个请求通常无需等待节点连接；失败时由之后的请求重试"""
+    def run():
+        try:
+            warmup()
+        except Exception as e:
+            app.logger.warning(f"Background Web3 warmup failed: {e}")
+
+    threading.Thread(target=run, name='web3-warmup', daemon=True).start()
 
 
 def get_w3():
     if not w3_instance:
         raise RuntimeError("Web3 not initialized. Call init_web3 first within app context.")
+    if not _ready:
+        warmup()
     return w3_instance
 
 
 def get_contract():
     if not contract_instance:
         raise RuntimeError("Contract not initialized. Call init_web3 first within app context.")
+    if not _ready:
+        warmup()
     return contract_instance
 
 
+def get_rpc_endpoint_stats():
+    """各 RPC 节点的请求数、错误数与延迟统计"""
+    provider = get_w3().provider
+    if isinstance(provider, PooledFailoverHTTPProvider):
+        return provider.get_endpoint_stats()
+    return {}
+
+
 def get_ganache_accounts():
-    """获取初始化时从 Ganache 获取的账户列表"""
+    """获取预热时从 Ganache 获取的账户列表"""
+    if w3_instance and not _ready:
+        warmup()
     return ganache_accounts_list
+
+
+def supports_batching(w3):
+    """只有 JSON-RPC provider 支持批量请求"""
+    return isinstance(w3.provider, JSONBaseProvider)
+
+
+def batch_call(contract_calls):
+    """把多个合约只读调用合并为一次 JSON-RPC 批量请求，按顺序返回解码后的结果"""
+    if not contract_calls:
+        return []
+    w3 = get_w3()
+    if not supports_batching(w3):
+        # 不支持批量请求的 provider (例如进程内的 eth-tester) 逐个调用
+        return [contract_call.call() for contract_call in contract_calls]
+    with w3.batch_requests() as batch:
+        for contract_call in contract_calls:
+            batch.add(contract_call)
+        return batch.execute()
+
+
+def get_contract_snapshot():
+    """一次 RPC 往返获取投票状态和候选人数量: (phase, startTime, endTime, currentTime, candidatesCount)"""
+    contract = get_contract()
+    if current_app.config.get('CONTRACT_HAS_BATCH_VIEWS'):
+        return tuple(contract.functions.getSnapshot().call())
+    status_data, candidate_count = batch_call([
+        contract.functions.getVotingStatus(),
+        contract.functions.getCandidatesCount()
+    ])
+    return tuple(status_data) + (candidate_count,)
+
+
+def get_candidates_on_chain():
+    """获取所有候选人 [(name, voteCount), ...]，最多两次 RPC 往返而不是 N+1 次"""
+    contract = get_contract()
+    if current_app.config.get('CONTRACT_HAS_BATCH_VIEWS'):
+        names, vote_counts = contract.functions.getAllCandidates().call()
+        return list(zip(names, vote_counts))
+    candidate_count = contract.functions.getCandidatesCount().call()
+    results = batch_call([contract.functions.getCandidate(i) for i in range(candidate_count)])
+    return [(name, vote_count) for name, vote_count in results]
@@ -0,0 +1,5 @@
+# asgi.py
+# 异步服务入口: uvicorn asgi:app --host 0.0.0.0 --port 5000 --workers 4
+from app.asgi_app import create_asgi_app
+
+app = create_asgi_app()
@@ -36,7 +36,12 @@ CREATE TABLE IF NOT EXISTS voter_applications (
     reviewed_at TIMESTAMP NULL,
 
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-    FOREIGN KEY (reviewed_by_admin_id) REFERENCES users(id) ON DELETE SET NULL
+    FOREIGN KEY (reviewed_by_admin_id) REFERENCES users(id) ON DELETE SET NULL,
+
+    -- 管理员按状态/时间游标分页，以及按用户查询最新申请时使用的复合索引
+    INDEX idx_voter_applications_status_submitted (status, submitted_at, id),
+    INDEX idx_voter_applications_submitted (submitted_at, id),
+    INDEX idx_voter_applications_user_status (user_id, status, submitted_at)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- 创建选民表
@@ -75,4 +80,112 @@ CREATE TABLE IF NOT EXISTS votes (
 
     -- 确保一个选民只能投一次票
     UNIQUE KEY uq_voter_election (voter_id) 
-) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
\ No newline at end of file
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- 创建待确认投票表 (异步投票模式下，交易已发送但回执尚未确认)
+CREATE TABLE IF NOT EXISTS pending_votes (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    ticket_id VARCHAR(36) NOT NULL UNIQUE,           -- 返回给前端轮询的票据 ID
+    voter_id INT NOT NULL,                           -- 投票的选民ID (外键，关联 voters.id)
+    candidate_index_on_chain INT NOT NULL,           -- 链上候选人索引
+    transaction_hash VARCHAR(66) NOT NULL UNIQUE,    -- 已发送的投票交易哈希
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',   -- 'pending', 'confirmed', 'failed'
+    error_message VARCHAR(255) NULL,
+    vote_id INT NULL,                                -- 确认后写入 votes 表的记录 ID
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+
+    FOREIGN KEY (voter_id) REFERENCES voters(id) ON DELETE RESTRICT,
+    FOREIGN KEY (vote_id) REFERENCES votes(id) ON DELETE SET NULL,
+    INDEX idx_pending_votes_status (status)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+
+-- 已有数据库升级: 为 voter_applications 补充复合索引
+-- ALTER TABLE voter_applications
+--     ADD INDEX idx_voter_applications_status_submitted (status, submitted_at, id),
+--     ADD INDEX idx_voter_applications_submitted (submitted_at, id),
+--     ADD INDEX idx_voter_applications_user_status (user_id, status, submitted_at);
+
+
+-- 创建链上事件索引器游标表 (记录每个索引器已处理到的区块，重启后从此处继续)
+CREATE TABLE IF NOT EXISTS indexer_cursors (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(100) NOT NULL UNIQUE,
+    last_block BIGINT NOT NULL DEFAULT -1,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- 创建对账报告表 (每个对账任务保存最近一次运行的报告)
+CREATE TABLE IF NOT EXISTS reconciliation_reports (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(100) NOT NULL UNIQUE,
+    report TEXT NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- 创建发送账户 nonce 表 (多个服务进程用同一账户发送交易时，通过行锁串行分配 nonce)
+CREATE TABLE IF NOT EXISTS account_nonces (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    address VARCHAR(42) NOT NULL UNIQUE,
+    next_nonce BIGINT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- 创建调度器租约表 (多个服务进程中只有持有未过期租约的一个运行定时任务)
+CREATE TABLE IF NOT EXISTS scheduler_leases (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(100) NOT NULL UNIQUE,
+    holder VARCHAR(255) NOT NULL,
+    expires_at DATETIME(6) NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- 创建以太坊地址池表 (由 Ganache 账户列表初始化，注册时用 SELECT ... FOR UPDATE SKIP LOCKED 原子地占用)
+CREATE TABLE IF NOT EXISTS eth_address_pool (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    address VARCHAR(42) NOT NULL UNIQUE,
+    user_id INT NULL,                                -- 占用该地址的用户，NULL 表示可分配
+    claimed_at TIMESTAMP NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE SET NULL,
+    INDEX idx_eth_address_pool_user (user_id, id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- 创建投票周期表 (由索引器根据 VotingPeriodSet 事件写入)
+CREATE TABLE IF NOT EXISTS voting_periods (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    start_time BIGINT NOT NULL,
+    end_time BIGINT NOT NULL,
+    transaction_hash VARCHAR(66) NOT NULL UNIQUE,
+    block_number BIGINT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- 创建选举结果快照表 (VotingEnded 之后由 results_finalizer 写入，写入后不再修改)
+CREATE TABLE IF NOT EXISTS election_results (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    end_transaction_hash VARCHAR(66) NOT NULL UNIQUE,  -- endVoting 交易哈希
+    block_number BIGINT NOT NULL,                      -- VotingEnded 事件所在区块
+    start_time BIGINT NOT NULL,
+    end_time BIGINT NOT NULL,
+    total_votes INT NOT NULL,
+    registered_voters INT NOT NULL,                    -- 截至结束区块在链上注册的选民数
+    snapshot_hash CHAR(64) NOT NULL,                   -- 结果内容的 SHA-256，用作 ETag
+    finalized_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS election_result_candidates (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    result_id INT NOT NULL,
+    candidate_index INT NOT NULL,                      -- 链上候选人索引
+    candidate_id INT NULL,                             -- candidate_details.id
+    name VARCHAR(255) NOT NULL,
+    vote_count INT NOT NULL,                           -- 链上票数
+    db_vote_count INT NOT NULL DEFAULT 0,              -- 定稿时 votes 表中的票数，仅用于审计
+
+    FOREIGN KEY (result_id) REFERENCES election_results(id) ON DELETE CASCADE,
+    FOREIGN KEY (candidate_id) REFERENCES candidate_details(id) ON DELETE SET NULL,
+    UNIQUE KEY uq_result_candidate (result_id, candidate_index)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
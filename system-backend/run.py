@@ -1,7 +1,11 @@
 # run.py
+import multiprocessing
+
 from app import create_app
 
-app = create_app()
+# 密码哈希进程池的工作进程 (forkserver/spawn 启动) 会以 __mp_main__ 重新导入本文件，不在其中创建应用
+if multiprocessing.parent_process() is None:
+    app = create_app()
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,70 @@
+# bench_async_reads.py
+# 比较 WSGI 与 ASGI 两种服务模式下公共只读接口的并发吞吐量。
+# 先以相同的进程数分别启动两种服务，例如:
+#   gunicorn -w 2 -b 127.0.0.1:5000 "app:create_app()"
+#   uvicorn asgi:app --workers 2 --port 5001
+# 然后运行: python -m scripts.bench_async_reads --target wsgi=http://127.0.0.1:5000 --target asgi=http://127.0.0.1:5001
+import argparse
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+READ_PATHS = ['/api/candidates', '/api/voting_status', '/api/election_deadline']
+
+
+def run_client(base_url, path, deadline, latencies, errors, lock):
+    session = requests.Session()
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            response = session.get(base_url + path, timeout=30)
+            ok = response.status_code < 500
+        except requests.RequestException:
+            ok = False
+        elapsed = time.perf_counter() - started
+        with lock:
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors[0] += 1
+
+
+def bench(base_url, path, concurrency, duration):
+    latencies, errors, lock = [], [0], threading.Lock()
+    deadline = time.perf_counter() + duration
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for _ in range(concurrency):
+            executor.submit(run_client, base_url, path, deadline, latencies, errors, lock)
+
+    latencies.sort()
+    result = {'requests': len(latencies), 'errors': errors[0], 'rps': round(len(latencies) / duration, 1)}
+    if latencies:
+        result['p50_ms'] = round(statistics.median(latencies) * 1000, 1)
+        result['p99_ms'] = round(latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)] * 1000, 1)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent throughput of the public read routes.")
+    parser.add_argument('--target', action='append', required=True,
+                        help="label=base_url, e.g. wsgi=http://127.0.0.1:5000 (repeatable).")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[10, 50, 200])
+    parser.add_argument('--duration', type=float, default=10.0, help="Seconds per run.")
+    parser.add_argument('--path', action='append', help="Route to benchmark (default: all public read routes).")
+    args = parser.parse_args()
+
+    targets = [target.split('=', 1) for target in args.target]
+    print(f"{'target':<8} {'path':<24} {'clients':>7} {'rps':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for path in args.path or READ_PATHS:
+        for concurrency in args.concurrency:
+            for label, base_url in targets:
+                result = bench(base_url.rstrip('/'), path, concurrency, args.duration)
+                print(f"{label:<8} {path:<24} {concurrency:>7} {result['rps']:>9} "
+                      f"{result.get('p50_ms', '-'):>9} {result.get('p99_ms', '-'):>9} {result['errors']:>7}")
+
+
+if __name__ == '__main__':
+    main()
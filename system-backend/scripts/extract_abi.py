@@ -0,0 +1,37 @@
+# extract_abi.py
+# 从 truffle 构建产物 (含字节码、AST、sourcemap) 中只提取 ABI，生成启动时加载的精简文件。
+# 运行: python -m scripts.extract_abi [--source ../smart_contract/build/contracts/Voting.json] [--output Voting.abi.json]
+# 不指定 --output 时写入后端启动时检查的缓存位置 (CONTRACT_ABI_CACHE_DIR，默认为 Flask 实例目录)。
+import argparse
+import os
+import sys
+
+# 将 system-backend 目录添加到 Python 路径
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+import config  # noqa: E402
+from app.utils.web3_utils import write_compact_abi  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract the contract ABI into a compact artifact.")
+    parser.add_argument('--source', default=config.CONTRACT_ABI_PATH,
+                        help="Truffle build artifact (relative paths are resolved against system-backend).")
+    parser.add_argument('--output', default=None, help="Compact artifact path (default: the backend's ABI cache).")
+    args = parser.parse_args()
+
+    source = os.path.abspath(os.path.join(backend_dir, args.source))
+    output = args.output
+    if output is None:
+        cache_dir = os.path.join(backend_dir, config.CONTRACT_ABI_CACHE_DIR or 'instance')
+        output = os.path.join(cache_dir, os.path.splitext(os.path.basename(source))[0] + '.abi.json')
+
+    abi = write_compact_abi(source, output)
+    print(f"Wrote {len(abi)} ABI entries from {source} ({os.path.getsize(source)} bytes) "
+          f"to {output} ({os.path.getsize(output)} bytes).")
+
+
+if __name__ == '__main__':
+    main()
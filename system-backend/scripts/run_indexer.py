@@ -0,0 +1,41 @@
+# run_indexer.py
+# 独立运行的链上事件索引器: python -m scripts.run_indexer [--once]
+import argparse
+import os
+import sys
+
+from dotenv import load_dotenv
+
+# 将 system-backend 目录添加到 Python 路径
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+load_dotenv(os.path.join(backend_dir, '.env'))
+
+from app import create_app  # noqa: E402
+from app.utils.chain_indexer import ChainIndexer  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mirror Voting contract events into the database.")
+    parser.add_argument('--once', action='store_true', help="Process pending blocks once and exit.")
+    parser.add_argument('--name', default='default', help="Indexer cursor name.")
+    args = parser.parse_args()
+
+    app = create_app(init_scheduler=False)
+    with app.app_context():
+        indexer = ChainIndexer(
+            name=args.name,
+            block_range=app.config.get('EVENT_LOG_BLOCK_RANGE', 5000),
+            confirmations=app.config.get('INDEXER_CONFIRMATIONS', 0)
+        )
+        if args.once:
+            processed = indexer.run_once()
+            print(f"Indexer processed {processed} events.")
+        else:
+            indexer.run_forever(poll_interval=app.config.get('INDEXER_POLL_INTERVAL_SECONDS', 2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+# tests/test_nonce_coordination.py
+# 在进程内的 eth-tester 链与临时 SQLite 上验证跨进程 nonce 协调 (NONCE_COORDINATION='database')
+# 依赖: pip install "eth-tester[py-evm]" py-solc-x pytest；也可用 VOTING_CONTRACT_ARTIFACT 指定 truffle 构建产物
+# 运行: cd system-backend && python -m pytest -q tests
+import json
+import os
+import sys
+import threading
+
+import pytest
+
+pytest.importorskip('eth_tester')
+
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from web3 import Web3  # noqa: E402
+
+from scripts import benchmark  # noqa: E402
+from app import db  # noqa: E402
+from app.models.models import AccountNonce, Voter  # noqa: E402
+from app.utils.nonce_manager import DatabaseNonceCoordinator, NonceManager  # noqa: E402
+
+
+@pytest.fixture
+def chain_app(tmp_path):
+    try:
+        abi, bytecode = benchmark.load_contract_artifact(os.environ.get('VOTING_CONTRACT_ARTIFACT'))
+    except (SystemExit, Exception) as e:
+        pytest.skip(f"Voting contract unavailable: {e}")
+
+    provider = benchmark.LockedEthereumTesterProvider()
+    w3 = Web3(provider)
+    address = benchmark.deploy_contract(w3, abi, bytecode)
+    abi_path = tmp_path / 'Voting.json'
+    abi_path.write_text(json.dumps({'abi': abi}), encoding='utf-8')
+
+    app = benchmark.create_app(init_scheduler=False, web3_provider=provider, config_overrides={
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+        'CONTRACT_ADDRESS': address,
+        'CONTRACT_ABI_PATH': str(abi_path),
+        'CONTRACT_ABI_CACHE_DIR': str(tmp_path),
+        'NONCE_COORDINATION': 'database',
+        'WEB3_LAZY_INIT': False,
+    })
+    contract = w3.eth.contract(address=address, abi=abi)
+    return app, w3, contract
+
+
+def test_review_approval_sends_coordinated_transaction(chain_app):
+    """审核通过时请求会话已有未提交的修改，协调器的行锁不能被它挡住 (SQLite 的库级写锁)"""
+    app, w3, contract = chain_app
+    admin_token, _, application_ids = benchmark.seed_database(
+        app, w3.eth.accounts[0], w3.eth.accounts[1:2], ['A'], reset=False)
+
+    response = app.test_client().put(f'/api/admin/voter_applications/{application_ids[0]}/review',
+                                     json={'status': 'approved'},
+                                     headers={'Authorization': f'Bearer {admin_token}'})
+
+    assert response.status_code == 200, response.get_json()
+    assert contract.functions.getVoterInfo(w3.eth.accounts[1]).call()[0]
+    with app.app_context():
+        assert Voter.query.count() == 1
+        row = AccountNonce.query.filter_by(address=w3.eth.accounts[0]).one()
+        assert row.next_nonce == w3.eth.get_transaction_count(w3.eth.accounts[0])
+
+
+def test_concurrent_managers_share_nonce_sequence(chain_app):
+    """两个 NonceManager (模拟两个服务进程) 并发发送，nonce 不重复；链外发送的交易之后能重新同步"""
+    app, w3, contract = chain_app
+    admin = w3.eth.accounts[0]
+    with app.app_context():
+        db.create_all()
+    managers = [NonceManager(w3, coordinator=DatabaseNonceCoordinator()) for _ in range(2)]
+    errors, tx_hashes = [], []
+
+    def send(manager, worker):
+        with app.app_context():
+            for i in range(5):
+                try:
+                    tx_hashes.append(manager.transact(contract.functions.addCandidate(f'c{worker}-{i}'),
+                                                      {'from': admin, 'gas': 200000}))
+                except Exception as e:
+                    errors.append(e)
+
+    threads = [threading.Thread(target=send, args=(managers[worker % 2], worker)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    benchmark.transact_and_wait(w3, contract.functions.addCandidate('external'))
+    with app.app_context():
+        tx_hashes.append(managers[0].transact(contract.functions.addCandidate('after'), {'from': admin, 'gas': 200000}))
+
+    assert errors == []
+    assert all(w3.eth.wait_for_transaction_receipt(tx_hash).status == 1 for tx_hash in tx_hashes)
+    assert contract.functions.getCandidatesCount().call() == len(tx_hashes) + 1
+    with app.app_context():
+        assert AccountNonce.query.filter_by(address=admin).one().next_nonce == w3.eth.get_transaction_count(admin)